@@ -0,0 +1,135 @@
+# app/cache.py
+
+import os
+import time
+from collections import OrderedDict
+
+# Read-through cache of API responses, limited by the summed size of the cached bodies.
+# Responses of open ranges expire after CACHE_TTL seconds, responses of closed ranges
+# (ending more than CACHE_CLOSED_AFTER seconds ago) stay until they are evicted or invalidated by a write.
+CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "10"))
+CACHE_CLOSED_AFTER = float(os.getenv("RESPONSE_CACHE_CLOSED_AFTER", "86400"))
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires", "symbol", "start_ms", "end_ms")
+
+    def __init__(self, value, size, expires, symbol, start_ms, end_ms):
+        self.value = value
+        self.size = size
+        self.expires = expires
+        self.symbol = symbol
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+
+
+class ResponseCache:
+    """
+    LRU cache with per entry expiry. Entries may be tagged with a symbol and the open_time range (milliseconds,
+    None for unbounded) they were read from, so writes only drop the entries they actually make stale.
+    Only used from the event loop, so there is no locking.
+    """
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL, closed_after=CACHE_CLOSED_AFTER):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.closed_after = closed_after
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def is_closed(self, end_ms) -> bool:
+        """
+        Whether a range ending at end_ms is old enough to not get new candles anymore
+        """
+        return end_ms is not None and end_ms < (time.time() - self.closed_after) * 1000
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires is not None and entry.expires < time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def peek(self, key):
+        """
+        Like get() but without touching the LRU order or the counters
+        """
+        entry = self._entries.get(key)
+        return entry.value if entry is not None else None
+
+    def put(self, key, value, size: int, symbol: str = None, start_ms: int = None, end_ms: int = None, ttl: float = None):
+        """
+        Caches value (taking size bytes). Without ttl, entries of closed ranges never expire and all others use the default TTL.
+        Values larger than a quarter of the cache are not cached, they would push out everything else.
+        """
+        if size > self.max_bytes // 4:
+            return
+        if ttl is None and not self.is_closed(end_ms):
+            ttl = self.ttl
+        if key in self._entries:
+            self._remove(key)
+        expires = time.monotonic() + ttl if ttl is not None else None
+        self._entries[key] = _Entry(value, size, expires, symbol, start_ms, end_ms)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def discard(self, key):
+        if key in self._entries:
+            self._remove(key)
+            self.invalidations += 1
+
+    def invalidate(self, symbol: str, start_ms: int = None, end_ms: int = None) -> int:
+        """
+        Drops the entries of symbol whose range overlaps [start_ms, end_ms] (None for unbounded).
+        Returns the number of dropped entries.
+        """
+        stale = [
+            key for key, entry in self._entries.items()
+            if entry.symbol == symbol
+            and (start_ms is None or entry.end_ms is None or entry.end_ms >= start_ms)
+            and (end_ms is None or entry.start_ms is None or entry.start_ms <= end_ms)
+        ]
+        for key in stale:
+            self._remove(key)
+        self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+
+response_cache = ResponseCache()
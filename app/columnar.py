@@ -0,0 +1,74 @@
+# app/columnar.py
+
+import os
+import numpy as np
+import pandas as pd
+from models import OHLCDataModel
+
+# Number of documents handed to MongoDB per insert/bulk_write
+BATCH_SIZE = 10_000
+
+# Column order and dtypes come straight from the API model, so CSV parsing and the API agree on the schema
+OHLC_COLUMNS = list(OHLCDataModel.__fields__)
+OHLC_DTYPES = {
+    name: np.int64 if field.outer_type_ is int else np.float64
+    for name, field in OHLCDataModel.__fields__.items()
+}
+
+# Binance archives from data.binance.vision have no header and a trailing 'ignore' column
+HEADERLESS_COLUMNS = OHLC_COLUMNS + ["ignore"]
+
+
+# Helper to check whether a CSV starts with a header line, without consuming the stream
+def _has_header(source) -> bool:
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            first = f.read(64)
+    elif hasattr(source, "peek"):
+        first = source.peek(64)
+    else:
+        position = source.tell()
+        first = source.read(64)
+        source.seek(position)
+    if isinstance(first, str):
+        first = first.encode()
+    return not first.lstrip()[:1].isdigit()
+
+
+def read_ohlc_csv(source, chunksize=None):
+    """
+    Reads a kline CSV (path or file object) with explicit dtypes from OHLCDataModel.
+    Works for CSVs with and without header. Returns a DataFrame, or an iterator of DataFrames if chunksize is set.
+    """
+    if _has_header(source):
+        return pd.read_csv(source, usecols=OHLC_COLUMNS, dtype=OHLC_DTYPES, chunksize=chunksize)
+    return pd.read_csv(
+        source, header=None, names=HEADERLESS_COLUMNS, usecols=OHLC_COLUMNS, dtype=OHLC_DTYPES, chunksize=chunksize
+    )
+
+
+# Helper to turn a column into an array whose tolist() gives BSON-encodable Python values
+def _column_array(series: pd.Series) -> np.ndarray:
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        if series.dt.tz is not None:
+            series = series.dt.tz_convert("UTC").dt.tz_localize(None)
+        # datetime64[ns].tolist() would give plain ints, microsecond precision gives datetime objects
+        return series.to_numpy().astype("datetime64[us]").astype(object)
+    return series.to_numpy()
+
+
+def iter_documents(df: pd.DataFrame, batch_size=BATCH_SIZE, extra=None):
+    """
+    Lazily yields lists of at most batch_size BSON-ready documents built from the typed column arrays of df.
+    Only one batch of Python objects exists at a time, instead of one dict per row for the whole frame
+    as with df.to_dict(orient="records"). Fields in extra (e.g. {"key": "BTCUSDC"}) are added to every document.
+    """
+    names = [str(name) for name in df.columns]
+    arrays = [_column_array(df[name]) for name in df.columns]
+    extra = extra or {}
+    keys = names + list(extra)
+    extra_values = tuple(extra.values())
+
+    for start in range(0, len(df), batch_size):
+        columns = [array[start:start + batch_size].tolist() for array in arrays]
+        yield [dict(zip(keys, row + extra_values)) for row in zip(*columns)]
@@ -3,13 +3,14 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo import MongoClient
 from bson import ObjectId
+from metrics import CommandMetrics
 import os
 
 # Load the MongoDB URL from environment variables
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 
-# Initialize MongoDB client
-client = AsyncIOMotorClient(MONGO_URL)
+# Initialize MongoDB client, its commands are timed for /metrics
+client = AsyncIOMotorClient(MONGO_URL, event_listeners=[CommandMetrics()])
 db = client["OPA_Data"] 
 
 # Helper to convert ObjectId to string in JSON responses
@@ -0,0 +1,197 @@
+# app/formats.py
+
+import io
+import json
+import os
+import zlib
+from typing import Optional
+import msgpack
+import numpy as np
+import pyarrow as pa
+import zstandard
+from fastapi.encoders import jsonable_encoder
+from columnar import OHLC_DTYPES
+
+# Response formats of /data. JSON stays the default, the binary formats are built column by column:
+# Arrow IPC stream (one record batch per page or cursor batch) and MessagePack ({column: [values]} per batch).
+JSON = "application/json"
+NDJSON = "application/x-ndjson"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+MSGPACK = "application/x-msgpack"
+MEDIA_TYPES = {
+    JSON: JSON,
+    "application/*": JSON,
+    "*/*": JSON,
+    ARROW_STREAM: ARROW_STREAM,
+    MSGPACK: MSGPACK,
+    "application/msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+
+# Content encodings in order of preference. Bodies below MIN_COMPRESS_BYTES are sent as they are.
+ENCODINGS = ("zstd", "gzip")
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))
+MIN_COMPRESS_BYTES = 1024
+
+ARROW_TYPES = {np.int64: pa.int64(), np.float64: pa.float64()}
+
+
+# Helper to parse an Accept / Accept-Encoding header into its values, highest quality first (q=0 is left out)
+def _header_values(header: Optional[str]) -> list:
+    values = []
+    for position, part in enumerate((header or "").split(",")):
+        value, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if value and quality > 0:
+            values.append((-quality, position, value.lower()))
+    return [value for _, _, value in sorted(values)]
+
+
+def negotiate_media_type(accept: Optional[str]) -> Optional[str]:
+    """
+    Picks the response format for an Accept header. JSON without header, None if nothing acceptable is supported.
+    """
+    values = _header_values(accept)
+    if not values:
+        return JSON
+    for value in values:
+        if value in MEDIA_TYPES:
+            return MEDIA_TYPES[value]
+    return None
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    values = _header_values(accept_encoding)
+    for encoding in ENCODINGS:
+        if encoding in values:
+            return encoding
+    return None
+
+
+def compressor(encoding: str):
+    """
+    Returns a streaming compressor (compress()/flush()) for a content encoding
+    """
+    if encoding == "gzip":
+        return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+
+def compress(body: bytes, encoding: Optional[str]):
+    """
+    Compresses a whole body. Returns the body and the content encoding that was actually applied.
+    """
+    if encoding is None or len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+    stream = compressor(encoding)
+    return stream.compress(body) + stream.flush(), encoding
+
+
+# Helper to turn a batch of documents into one list per column, the column names come from the first document
+def to_columns(documents: list, names: list = None) -> dict:
+    names = names or list(documents[0])
+    return {name: [document.get(name) for document in documents] for name in names}
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+class JsonEncoder:
+    """
+    JSON array for pages, one candle per line (NDJSON) for streams
+    """
+
+    def __init__(self, stream: bool = False):
+        self.stream = stream
+        self.media_type = NDJSON if stream else JSON
+
+    def encode(self, documents: list) -> bytes:
+        # Both layouts take the same documents: datetimes (time-series and preprocessed collections) become ISO strings,
+        # NaN is rejected instead of written as a non-standard token
+        documents = jsonable_encoder(documents)
+        if self.stream:
+            return "".join(_dumps(document) + "\n" for document in documents).encode()
+        return _dumps(documents).encode()
+
+    def close(self) -> bytes:
+        return b""
+
+
+class ArrowEncoder:
+    """
+    Arrow IPC stream. The schema is taken from the first batch, OHLC columns always get their model types.
+    Columns that only show up in later batches are left out.
+    """
+    media_type = ARROW_STREAM
+
+    def __init__(self, stream: bool = False):
+        self._sink = io.BytesIO()
+        self._writer = None
+        self._schema = None
+
+    def _batch(self, documents: list) -> pa.RecordBatch:
+        if self._schema is not None:
+            columns = to_columns(documents, self._schema.names)
+            return pa.RecordBatch.from_arrays(
+                [pa.array(columns[field.name], type=field.type) for field in self._schema], schema=self._schema
+            )
+        columns = to_columns(documents)
+        return pa.RecordBatch.from_arrays(
+            [pa.array(values, type=ARROW_TYPES.get(OHLC_DTYPES.get(name))) for name, values in columns.items()],
+            names=list(columns),
+        )
+
+    def _take(self) -> bytes:
+        data = self._sink.getvalue()
+        self._sink.seek(0)
+        self._sink.truncate()
+        return data
+
+    def encode(self, documents: list) -> bytes:
+        batch = self._batch(documents)
+        if self._writer is None:
+            self._schema = batch.schema
+            self._writer = pa.ipc.new_stream(self._sink, self._schema)
+        self._writer.write_batch(batch)
+        return self._take()
+
+    def close(self) -> bytes:
+        if self._writer is not None:
+            self._writer.close()
+        return self._take()
+
+
+class MsgpackEncoder:
+    """
+    One MessagePack map {column: [values]} per page or cursor batch, streams are a sequence of such maps
+    """
+    media_type = MSGPACK
+
+    def __init__(self, stream: bool = False):
+        self._packer = msgpack.Packer(default=str)
+
+    def encode(self, documents: list) -> bytes:
+        return self._packer.pack(to_columns(documents))
+
+    def close(self) -> bytes:
+        return b""
+
+
+ENCODERS = {JSON: JsonEncoder, ARROW_STREAM: ArrowEncoder, MSGPACK: MsgpackEncoder}
+
+
+def new_encoder(media_type: str, stream: bool = False):
+    return ENCODERS[media_type](stream)
+
+
+def encode_page(documents: list, media_type: str) -> bytes:
+    encoder = new_encoder(media_type)
+    return encoder.encode(documents) + encoder.close()
@@ -0,0 +1,102 @@
+# app/indexes.py
+
+import os
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+from storage import collection_is_timeseries, TIME_FIELD, META_FIELD
+
+# Make sure every candle collection has the indexes /data and the scripts query with, at startup of the API
+ENSURE_INDEXES = os.getenv("ENSURE_INDEXES", "1") == "1"
+
+# Collections that do not hold candles
+SKIPPED_COLLECTIONS = ("ingest_manifest",)
+
+DUPLICATE_KEY = 11000
+
+# Collections whose indexes were checked by this process
+_checked = set()
+
+
+def duplicate_positions(error) -> set:
+    """
+    Takes the BulkWriteError of an unordered insert_many. Returns the positions of the documents that were rejected
+    by a unique index (the others are written), or None if there were other errors as well.
+    """
+    write_errors = error.details.get("writeErrors", [])
+    if error.details.get("writeConcernErrors") or any(item["code"] != DUPLICATE_KEY for item in write_errors):
+        return None
+    return {item["index"] for item in write_errors}
+
+
+async def index_plan(db, name: str) -> list:
+    """
+    Returns the indexes a collection should have as (keys, unique) pairs:
+    - open_time ascending on every candle collection (OHLC and preprocessed_*), unique where there is one candle per minute
+    - unique (key, open_time) on collections tagged with the symbol in 'key' (read_to_db_neha.py)
+    - (key, open_time) on time-series collections, they cannot have unique indexes
+    """
+    if name in SKIPPED_COLLECTIONS or name.startswith("system.") or name.endswith("_backup"):
+        return []
+    if await collection_is_timeseries(db, name):
+        return [([(META_FIELD, ASCENDING), (TIME_FIELD, ASCENDING)], False)]
+
+    sample = await db[name].find_one({}, {TIME_FIELD: 1, META_FIELD: 1})
+    if sample is None or TIME_FIELD not in sample:
+        return []
+    if META_FIELD in sample:
+        return [
+            ([(META_FIELD, ASCENDING), (TIME_FIELD, ASCENDING)], True),
+            ([(TIME_FIELD, ASCENDING)], False),
+        ]
+    return [([(TIME_FIELD, ASCENDING)], True)]
+
+
+async def ensure_collection_indexes(db, name: str) -> list:
+    """
+    Creates the missing indexes of index_plan() on one collection. An index with the same keys counts as present,
+    whatever its options. Unique indexes that fail on existing duplicates are created as plain indexes instead.
+    Returns the key lists of the created indexes.
+    """
+    existing = await db[name].index_information()
+    present = {tuple((field, int(direction)) for field, direction in index["key"]) for index in existing.values()}
+
+    created = []
+    for keys, unique in await index_plan(db, name):
+        if tuple(keys) in present:
+            continue
+        try:
+            await db[name].create_index(keys, unique=unique)
+        except OperationFailure as e:
+            if not unique or e.code != DUPLICATE_KEY:
+                raise
+            print(f"{name} has duplicate candles, creating {keys} without unique constraint: {e}")
+            await db[name].create_index(keys)
+        created.append(keys)
+    _checked.add(name)
+    return created
+
+
+async def ensure_written_collection_indexes(db, name: str):
+    """
+    Checks the indexes of a collection the API writes to, once per collection and process.
+    Called after the write, so new collections already have a document to inspect.
+    """
+    if name not in _checked:
+        await ensure_collection_indexes(db, name)
+
+
+async def ensure_indexes(db) -> dict:
+    """
+    Checks every collection of db. Returns {collection: created key lists} of the collections that got new indexes.
+    """
+    report = {}
+    for name in sorted(await db.list_collection_names()):
+        try:
+            created = await ensure_collection_indexes(db, name)
+        except OperationFailure as e:
+            print(f"Could not create the indexes of {name}: {e}")
+            continue
+        if created:
+            print(f"Created indexes on {name}: {created}")
+            report[name] = created
+    return report
@@ -0,0 +1,129 @@
+# app/indicator_cache.py
+
+import numpy as np
+from cache import response_cache
+from indicators import compute_indicators, warmup_rows
+from storage import from_storage, time_value, TIME_FIELD
+
+# Computed indicator values are cached per symbol and indicator set as one contiguous segment of candles,
+# together with the kernel states at its end. Requests inside the segment are sliced from it, requests reaching
+# past its end only compute the new candles.
+# Requests that do not overlap the segment replace it. Writes into the segment (or its warm-up) drop it via the response cache.
+MAX_SEGMENT_ROWS = 200_000
+SEGMENT_TTL = 3600
+
+
+class Segment:
+    def __init__(self, open_time, close, columns, states, warmup_start, starts_at_first_candle):
+        self.open_time = open_time      # int64 milliseconds
+        self.close = close
+        self.columns = columns          # {indicator: float64 values}
+        self.states = states            # kernel states after the last candle
+        self.warmup_start = warmup_start  # first candle the values depend on, None if that is the first candle of the symbol
+        self.starts_at_first_candle = starts_at_first_candle
+
+    @property
+    def start_ms(self) -> int:
+        return int(self.open_time[0])
+
+    @property
+    def end_ms(self) -> int:
+        return int(self.open_time[-1])
+
+    @property
+    def nbytes(self) -> int:
+        return self.open_time.nbytes + self.close.nbytes + sum(values.nbytes for values in self.columns.values())
+
+
+# Helper to load open_time (ms) and close of the candles matching query as arrays
+async def _load(collection, query: dict, sort: int, limit: int) -> tuple:
+    documents = await collection.find(query, {"_id": 0, TIME_FIELD: 1, "close": 1}).sort(TIME_FIELD, sort).limit(limit).to_list(limit)
+    if sort < 0:
+        documents.reverse()
+    documents = [from_storage(document) for document in documents]
+    open_time = np.array([document[TIME_FIELD] for document in documents], dtype=np.int64)
+    close = np.array([document["close"] for document in documents], dtype=np.float64)
+    return open_time, close
+
+
+def _range_query(timeseries: bool, after_ms=None, start_ms=None, end_ms=None, before_ms=None) -> dict:
+    open_time = {}
+    if after_ms is not None:
+        open_time["$gt"] = time_value(after_ms, timeseries)
+    if start_ms is not None:
+        open_time["$gte"] = time_value(start_ms, timeseries)
+    if end_ms is not None:
+        open_time["$lte"] = time_value(end_ms, timeseries)
+    if before_ms is not None:
+        open_time["$lt"] = time_value(before_ms, timeseries)
+    return {TIME_FIELD: open_time} if open_time else {}
+
+
+async def _compute_segment(collection, timeseries: bool, names: tuple, start_ms, end_ms, limit: int):
+    warmup = warmup_rows(names)
+    warm_time, warm_close = (
+        await _load(collection, _range_query(timeseries, before_ms=start_ms), -1, warmup)
+        if start_ms is not None and warmup else (np.empty(0, dtype=np.int64), np.empty(0))
+    )
+    open_time, close = await _load(collection, _range_query(timeseries, start_ms=start_ms, end_ms=end_ms), 1, limit)
+    if len(open_time) == 0:
+        return None
+
+    columns, states = compute_indicators(names, np.concatenate([warm_close, close]))
+    columns = {name: values[len(warm_close):] for name, values in columns.items()}
+    # Less warm-up than asked for means the history of the symbol starts there
+    warmup_start = int(warm_time[0]) if len(warm_time) == warmup and warmup else None
+    return Segment(open_time, close, columns, states, warmup_start, start_ms is None or len(warm_time) == 0)
+
+
+async def _extend_segment(collection, timeseries: bool, segment: Segment, names: tuple, end_ms, limit: int):
+    open_time, close = await _load(collection, _range_query(timeseries, after_ms=segment.end_ms, end_ms=end_ms), 1, limit)
+    if len(open_time) == 0:
+        return segment
+
+    columns, states = compute_indicators(names, close, segment.states)
+    segment = Segment(
+        np.concatenate([segment.open_time, open_time]),
+        np.concatenate([segment.close, close]),
+        {name: np.concatenate([segment.columns[name], columns[name]]) for name in names},
+        states,
+        segment.warmup_start,
+        segment.starts_at_first_candle,
+    )
+    if len(segment.open_time) > MAX_SEGMENT_ROWS:
+        drop = len(segment.open_time) - MAX_SEGMENT_ROWS
+        segment = Segment(
+            segment.open_time[drop:], segment.close[drop:],
+            {name: values[drop:] for name, values in segment.columns.items()},
+            segment.states, segment.warmup_start, False,
+        )
+    return segment
+
+
+async def indicator_segment(collection, symbol: str, timeseries: bool, names: tuple, start_ms, end_ms, limit: int) -> Segment:
+    """
+    Returns a segment with the indicators of the candles with open_time in [start_ms, end_ms] (None for unbounded),
+    at most limit candles from start_ms on. Uses and updates the cached segment of symbol and names.
+    """
+    key = ("indicators", symbol, names)
+    segment = response_cache.get(key)
+    if start_ms is None and segment is not None and segment.starts_at_first_candle:
+        # The cached segment starts at the first candle, like a request without start
+        start_ms = segment.start_ms
+
+    if segment is None or start_ms is None or start_ms < segment.start_ms or start_ms > segment.end_ms:
+        # Not overlapping the cached segment, start a new one
+        segment = await _compute_segment(collection, timeseries, names, start_ms, end_ms, limit)
+    elif end_ms is None or end_ms > segment.end_ms:
+        first = int(np.searchsorted(segment.open_time, start_ms))
+        needed = limit - (len(segment.open_time) - first)
+        if needed > 0:
+            segment = await _extend_segment(collection, timeseries, segment, names, end_ms, needed)
+            if start_ms < segment.start_ms:
+                # The segment was trimmed past the requested start
+                segment = await _compute_segment(collection, timeseries, names, start_ms, end_ms, limit)
+    if segment is None:
+        return None
+
+    response_cache.put(key, segment, segment.nbytes, symbol, segment.warmup_start, segment.end_ms, ttl=SEGMENT_TTL)
+    return segment
@@ -0,0 +1,333 @@
+# app/indicators.py
+
+import re
+import numpy as np
+from scipy.signal import lfilter
+
+# Vectorized indicator kernels, shared by the API (/indicators) and the preprocessing scripts.
+# Every kernel takes the state returned by its previous call, so a series can be computed piece by piece
+# (sliding API requests, incremental preprocessing) with the same result as in one go. state=None starts a new series.
+# Inputs are converted to contiguous float64 arrays once, the recursions run in scipy's lfilter instead of Python loops.
+# The results match pandas_ta 0.3.14b0 (rsi, sma, ema, macd, bbands, atr) and pandas (ewm, pct_change, shift),
+# see scripts/bench_indicators.py.
+
+# Rows of warm-up before a range for indicators with infinite memory (EWM based), as multiple of their length.
+# (1 - 1/14) ** (20 * 14) is ~1e-9, so values after the warm-up equal those over the full history.
+EWM_WARMUP_FACTOR = 20
+
+# Longest indicator length a request may ask for. Bounds the warm-up read from MongoDB (EWM_WARMUP_FACTOR * length)
+# and the rolling windows of one request.
+MAX_INDICATOR_LENGTH = 1000
+
+# Rows per block of the rolling standard deviation, bounds its (rows x length) temporary
+ROLLING_BLOCK_ROWS = 65_536
+
+DEFAULT_INDICATORS = ("rsi_14", "sma_50", "sma_200")
+
+
+def _float_array(values):
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def _ewm_memory(beta: float) -> int:
+    """
+    Rows after which the weight beta ** rows of older values is below double precision
+    """
+    if beta <= 0.0:
+        return 1
+    return int(np.ceil(-60 * np.log(2) / np.log(beta))) + 1
+
+
+def ewm_mean(values, alpha: float, min_periods: int = 0, state=None):
+    """
+    Exponentially weighted mean like pandas ewm(alpha=alpha, adjust=True, min_periods=min_periods).mean().
+    NaNs carry no weight but let the older values decay (ignore_na=False). State: (numerator, denominator, observations).
+    """
+    x = _float_array(values)
+    numerator, denominator, observations = state if state is not None else (0.0, 0.0, 0)
+    if len(x) == 0:
+        return x.copy(), (numerator, denominator, observations)
+
+    beta = 1.0 - alpha
+    valid = ~np.isnan(x)
+    if valid.all():
+        numerators = lfilter([1.0], [1.0, -beta], x, zi=[beta * numerator])[0]
+        # Without NaNs the denominators converge to 1 / alpha, only their first rows need the recursion
+        head = min(len(x), _ewm_memory(beta))
+        denominators = np.empty(len(x))
+        denominators[:head] = lfilter([1.0], [1.0, -beta], np.ones(head), zi=[beta * denominator])[0]
+        denominators[head:] = denominators[head - 1]
+        warming_up = slice(0, max(0, max(min_periods, 1) - observations - 1))
+        counts = observations + len(x)
+    else:
+        numerators = lfilter([1.0], [1.0, -beta], np.where(valid, x, 0.0), zi=[beta * numerator])[0]
+        denominators = lfilter([1.0], [1.0, -beta], valid.astype(np.float64), zi=[beta * denominator])[0]
+        running_counts = observations + np.cumsum(valid)
+        warming_up = running_counts < max(min_periods, 1)
+        counts = int(running_counts[-1])
+
+    numerator = numerators[-1]
+    out = numerators  # divided in place
+    with np.errstate(invalid="ignore", divide="ignore"):
+        np.divide(out, denominators, out=out)
+    out[warming_up] = np.nan
+    return out, (numerator, denominators[-1], counts)
+
+
+def rma(values, length: int, state=None):
+    """
+    Wilder's moving average (pandas_ta rma): EWM with alpha 1/length
+    """
+    return ewm_mean(values, 1.0 / length, length, state)
+
+
+def ema(values, length: int, state=None):
+    """
+    EMA like pandas_ta.ema: seeded with the mean of the first length values, then ewm(span=length, adjust=False).
+    For series without NaNs. State: (values collected for the seed, previous EMA).
+    """
+    x = _float_array(values)
+    seed, previous = state if state is not None else (np.empty(0), np.nan)
+    alpha = 2.0 / (length + 1)
+
+    out = np.full(len(x), np.nan)
+    if np.isnan(previous):
+        # Still collecting the first length values
+        seed = np.concatenate([seed, x])
+        if len(seed) < length:
+            return out, (seed, np.nan)
+        first = length - 1 - (len(seed) - len(x))  # position of the seed value in x
+        previous = seed[:length].mean()
+        out[first] = previous
+        x = x[first + 1:]
+        rest = out[first + 1:]
+    else:
+        rest = out
+
+    if len(x):
+        rest[:] = lfilter([alpha], [1.0, alpha - 1.0], x, zi=[(1.0 - alpha) * previous])[0]
+        previous = rest[-1]
+    return out, (np.empty(0), previous)
+
+
+def _window_history(history, x, length: int):
+    """
+    The last length - 1 values of history followed by x, the state of the rolling kernels
+    """
+    full = np.concatenate([history, x])
+    return full, full[max(0, len(full) - (length - 1)):] if length > 1 else np.empty(0)
+
+
+def sma(values, length: int, state=None):
+    """
+    Simple moving average like rolling(length, min_periods=length).mean(). State: the last length - 1 values.
+    """
+    x = _float_array(values)
+    history = state if state is not None else np.empty(0)
+    full, new_state = _window_history(history, x, length)
+    out = np.full(len(full), np.nan)
+
+    if len(full) >= length:
+        valid = ~np.isnan(full)
+        all_valid = valid.all()
+        # Sums of differences to the first value keep the cumulative sum small, so its rounding errors stay small
+        offset = full[np.argmax(valid)] if valid.any() else 0.0
+        deviations = full - offset
+        if not all_valid:
+            deviations[~valid] = 0.0
+        sums = np.empty(len(full) + 1)
+        sums[0] = 0.0
+        np.cumsum(deviations, out=sums[1:])
+
+        window = out[length - 1:]
+        np.subtract(sums[length:], sums[:-length], out=window)
+        window /= length
+        window += offset
+        if not all_valid:
+            counts = np.concatenate([[0], np.cumsum(valid)])
+            window[counts[length:] - counts[:-length] != length] = np.nan
+
+    return out[len(history):], new_state
+
+
+def rolling_std(values, length: int, ddof: int = 0, state=None):
+    """
+    Rolling standard deviation like rolling(length).std(ddof=ddof). Computed from the windows themselves,
+    block by block, instead of running sums of squares, which lose all precision at prices of 10^4 and more.
+    State: the last length - 1 values.
+    """
+    x = _float_array(values)
+    history = state if state is not None else np.empty(0)
+    full, new_state = _window_history(history, x, length)
+    out = np.full(len(full), np.nan)
+
+    for start in range(0, len(full) - length + 1, ROLLING_BLOCK_ROWS):
+        block = full[start:start + ROLLING_BLOCK_ROWS + length - 1]
+        windows = np.lib.stride_tricks.sliding_window_view(block, length)
+        out[start + length - 1:start + length - 1 + len(windows)] = windows.std(axis=1, ddof=ddof)
+
+    return out[len(history):], new_state
+
+
+def bbands(close, length: int = 5, std: float = 2.0, ddof: int = 0, state=None):
+    """
+    Bollinger bands like pandas_ta.bbands (mamode sma). Returns ((lower, mid, upper, bandwidth, percent), state),
+    state: the last length - 1 closes.
+    """
+    x = _float_array(close)
+    mid, new_state = sma(x, length, state)
+    deviation, _ = rolling_std(x, length, ddof, state)
+    lower = mid - std * deviation
+    upper = mid + std * deviation
+    with np.errstate(invalid="ignore", divide="ignore"):
+        bandwidth = 100.0 * (upper - lower) / mid
+        percent = (x - lower) / (upper - lower)
+    return (lower, mid, upper, bandwidth, percent), new_state
+
+
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9, state=None):
+    """
+    MACD like pandas_ta.macd: ema(fast) - ema(slow), its signal line is the ema(signal) from the first MACD value on.
+    Returns ((macd, histogram, signal), state), state: the states of the three EMAs.
+    """
+    x = _float_array(close)
+    fast_state, slow_state, signal_state = state if state is not None else (None, None, None)
+    fast_ema, fast_state = ema(x, fast, fast_state)
+    slow_ema, slow_state = ema(x, slow, slow_state)
+    line = fast_ema - slow_ema
+
+    signal_line = np.full(len(x), np.nan)
+    valid = ~np.isnan(line)
+    signal_line[valid], signal_state = ema(line[valid], signal, signal_state)
+    return (line, line - signal_line, signal_line), (fast_state, slow_state, signal_state)
+
+
+def true_range(high, low, close, state=None):
+    """
+    Like pandas_ta.true_range: max(high - low, |high - previous close|, |previous close - low|), NaN for the first candle.
+    State: the previous close.
+    """
+    high, low, close = _float_array(high), _float_array(low), _float_array(close)
+    if len(close) == 0:
+        return close.copy(), state
+    previous = lag(close, 1, None if state is None else np.array([state]))[0]
+    ranges = np.maximum(high - low, np.maximum(np.abs(high - previous), np.abs(previous - low)))
+    return ranges, close[-1]
+
+
+def atr(high, low, close, length: int = 14, state=None):
+    """
+    Average true range like pandas_ta.atr (mamode rma). State: (previous close, rma state).
+    """
+    previous, rma_state = state if state is not None else (None, None)
+    ranges, previous = true_range(high, low, close, previous)
+    out, rma_state = rma(ranges, length, rma_state)
+    return out, (previous, rma_state)
+
+
+def rsi(close, length: int = 14, state=None):
+    """
+    Relative strength index like pandas_ta.rsi: Wilder's average of gains and losses of close.diff().
+    State: (previous close, gain state, loss state).
+    """
+    x = _float_array(close)
+    previous, gain_state, loss_state = state if state is not None else (np.nan, None, None)
+    if len(x) == 0:
+        return x.copy(), (previous, gain_state, loss_state)
+
+    out = np.full(len(x), np.nan)
+    if np.isnan(previous):
+        # The first close has no change, it comes before any weight of the averages
+        diff = np.diff(x)
+        rest = out[1:]
+    else:
+        diff = np.diff(x, prepend=previous)
+        rest = out
+    gain_average, gain_state = rma(np.maximum(diff, 0.0), length, gain_state)
+    loss_average, loss_state = rma(np.maximum(-diff, 0.0), length, loss_state)
+
+    # 100 * gain / (gain + loss), computed in the buffers of the averages
+    loss_average += gain_average
+    gain_average *= 100.0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        np.divide(gain_average, loss_average, out=rest)
+    return out, (x[-1], gain_state, loss_state)
+
+
+def lag(values, periods: int = 1, state=None):
+    """
+    Like Series.shift(periods). State: the last periods values.
+    """
+    x = _float_array(values)
+    history = state if state is not None else np.full(periods, np.nan)
+    full = np.concatenate([history, x])
+    return full[:len(x)], full[len(x):]
+
+
+def pct_change(values, state=None):
+    """
+    Like Series.pct_change() (for series without NaNs). State: the previous value.
+    """
+    x = _float_array(values)
+    if len(x) == 0:
+        return x.copy(), state
+    previous, _ = lag(x, 1, None if state is None else np.array([state]))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return x / previous - 1.0, x[-1]
+
+
+# Indicator names are <kind> or <kind>_<length>, i.e. rsi_14, sma_200 or price_change
+INDICATOR_PATTERN = re.compile(r"^(rsi|sma|ema)_(\d+)$|^(price_change)$")
+
+
+def parse_indicator(name: str) -> tuple:
+    """
+    Returns (kind, length) of an indicator name, raises ValueError for unknown ones
+    """
+    match = INDICATOR_PATTERN.match(name.lower())
+    if match is None:
+        raise ValueError(f"Unknown indicator {name}. Use rsi_<n>, sma_<n>, ema_<n> or price_change.")
+    if match.group(3):
+        return match.group(3), 1
+    length = int(match.group(2))
+    if not 1 <= length <= MAX_INDICATOR_LENGTH:
+        raise ValueError(f"Indicator length of {name} must be between 1 and {MAX_INDICATOR_LENGTH}.")
+    return match.group(1), length
+
+
+def warmup_rows(names) -> int:
+    """
+    Number of candles before a range needed so the indicators are valid (and exact) from its first candle on
+    """
+    rows = 0
+    for name in names:
+        kind, length = parse_indicator(name)
+        if kind in ("rsi", "ema"):
+            rows = max(rows, EWM_WARMUP_FACTOR * length)
+        elif kind == "sma":
+            rows = max(rows, length - 1)
+        else:
+            rows = max(rows, 1)
+    return rows
+
+
+def compute_indicators(names, close, states=None) -> tuple:
+    """
+    Computes the named indicators over close. Returns ({name: values}, {name: state}); pass the states
+    with the following closes to continue the series.
+    """
+    states = states or {}
+    columns, new_states = {}, {}
+    for name in names:
+        kind, length = parse_indicator(name)
+        state = states.get(name)
+        if kind == "rsi":
+            columns[name], new_states[name] = rsi(close, length, state)
+        elif kind == "sma":
+            columns[name], new_states[name] = sma(close, length, state)
+        elif kind == "ema":
+            columns[name], new_states[name] = ema(close, length, state)
+        else:
+            change, new_states[name] = pct_change(close, state)
+            columns[name] = change * 100
+    return columns, new_states
@@ -1,20 +1,35 @@
 # app/routers/items.py
 
 import docker
-from fastapi import APIRouter, FastAPI, File, UploadFile, HTTPException, Query
+from fastapi import APIRouter, FastAPI, File, UploadFile, HTTPException, Query, Response, Header
+from fastapi.responses import StreamingResponse
 from fastapi.encoders import jsonable_encoder
-from models import OHLCDataModel, ScriptArgs
+from models import OHLCDataModel, ScriptArgs, MultiSymbolQuery
 from database import db
+from uploads import uploads, start_upload, ingest_upload
+from storage import collection_is_timeseries, ensure_ohlc_collection, to_storage, from_storage, time_value
+from write_buffer import write_buffer, WRITE_BEHIND
+from cache import response_cache
+from jobs import jobs, submit_job, job_log, cancel_job, queue_stats, QueueFull
+from indexes import ensure_written_collection_indexes, ensure_collection_indexes, duplicate_positions
+from metrics import ENCODE_DURATION
+from indicators import DEFAULT_INDICATORS, parse_indicator
+from indicator_cache import indicator_segment
+from formats import JSON, ARROW_STREAM, MSGPACK, negotiate_media_type, negotiate_encoding, new_encoder, encode_page, compress, compressor, to_columns
 from typing import List, Optional
 from datetime import datetime
 import pandas as pd
+import numpy as np
 import zipfile
 import io
 import os
 from io import BytesIO
-from bson import ObjectId
+from bson import ObjectId, Timestamp
 from pymongo import MongoClient
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import base64
+import json
+import asyncio
 
 router = APIRouter()
 client = docker.from_env()
@@ -24,64 +39,143 @@ ubuntu_container = client.containers.get("ubuntu_script_runner")
 def datetime_to_timestamp(dt: datetime) -> int:
     return int(dt.timestamp() * 1000)
 
+# Helper to write candles directly, or through the write-behind buffer if WRITE_BEHIND is enabled
+async def write_data_points(symbol: str, data: List[OHLCDataModel], ack: bool) -> List[ObjectId]:
+    timeseries = await ensure_ohlc_collection(db, symbol)
+    documents = [{"_id": ObjectId(), **to_storage(point.dict(), symbol, timeseries)} for point in data]
+    try:
+        if WRITE_BEHIND:
+            await write_buffer.add(symbol, documents, wait=ack)
+        elif len(documents) == 1:
+            await db[symbol].insert_one(documents[0])       #New Collection ohlc_data, might need changing
+        else:
+            await db[symbol].insert_many(documents, ordered=False)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="A candle with this open_time already exists.")
+    except BulkWriteError as e:
+        # Candles already stored are skipped (unique open_time index), the others are written
+        rejected = duplicate_positions(e)
+        if rejected is None:
+            raise
+        # Only from the write buffer: like insert_one, a single candle that is already stored is a conflict
+        if len(documents) == 1:
+            raise HTTPException(status_code=409, detail="A candle with this open_time already exists.")
+        documents = [document for position, document in enumerate(documents) if position not in rejected]
+    open_times = [point.open_time for point in data]
+    invalidate_cache(symbol, min(open_times), max(open_times))
+    if not WRITE_BEHIND:
+        await ensure_written_collection_indexes(db, symbol)
+    return [document["_id"] for document in documents]
+
+# Cache key of the /trade-pairs response
+TRADE_PAIRS_KEY = ("trade-pairs",)
+
+# Helper to drop the cached responses a write of candles of symbol between start_ms and end_ms makes stale
+def invalidate_cache(symbol: str, start_ms: Optional[int], end_ms: Optional[int]):
+    response_cache.invalidate(symbol, start_ms, end_ms)
+    trade_pairs = response_cache.peek(TRADE_PAIRS_KEY)
+    if trade_pairs is not None and symbol not in trade_pairs:
+        response_cache.discard(TRADE_PAIRS_KEY)
+
 # 1. Single Datapoint Write Endpoint
 @router.post("/data-point")
-async def create_data_point(data: OHLCDataModel, symbol: str):
+async def create_data_point(data: OHLCDataModel, symbol: str, ack: bool = False):
     """
-    Entry point for singular Data Entry
+    Entry point for singular Data Entry\n
+    With write-behind enabled the point is buffered and written together with others,
+    pass ack=true to only get the response once it is stored.
     """
-    new_data = await db[symbol].insert_one(data)       #New Collection ohlc_data, might need changing
-    return {"message": "Data point added successfully", "id": str(new_data.inserted_id)}
+    ids = await write_data_points(symbol, [data], ack)
+    return {"message": "Data point added successfully", "id": str(ids[0])}
+
+# 1b. Batch Datapoint Write Endpoint
+@router.post("/data-points")
+async def create_data_points(data: List[OHLCDataModel], symbol: str, ack: bool = False):
+    """
+    Entry point for a batch of Data Entries of one symbol, written with a single insert_many
+    (or through the write-behind buffer, see /data-point)
+    """
+    if not data:
+        raise HTTPException(status_code=400, detail="No data points given.")
+    ids = await write_data_points(symbol, data, ack)
+    return {"message": "Data points added successfully", "records_added": len(ids), "duplicates_skipped": len(data) - len(ids)}
 
 # 2. Bulk Data Upload Endpoint
 @router.post("/upload-file")
-async def upload_file(symbol: str, file: UploadFile = File(...)):
+async def upload_file(symbol: str, file: UploadFile = File(...), upload_id: Optional[str] = None):
     """
     Upload Data in ZIP or CSV format for direct Data Entry.\n
-    The File doesnt get saved, and is directly inputted into MongoDB.
+    The File doesnt get saved, and is directly inputted into MongoDB.\n
+    The file is parsed chunk by chunk in a worker thread and written in batches, the progress can be
+    followed with GET /uploads/{upload_id} (pass your own upload_id to poll while the upload runs).
     """
     if file.content_type not in ["application/zip", "text/csv"]:
         raise HTTPException(status_code=400, detail="Only ZIP or CSV files are accepted")
 
-    data_list = []
-
-    if file.content_type == "application/zip":
-        with zipfile.ZipFile(io.BytesIO(await file.read())) as zip_file:
-            for filename in zip_file.namelist():
-                if filename.endswith(".csv"):
-                    with zip_file.open(filename) as csv_file:
-                        df = pd.read_csv(csv_file)
-                        data_list.extend(df.to_dict(orient="records"))
-    else:
-        df = pd.read_csv(io.BytesIO(await file.read()))
-        data_list = df.to_dict(orient="records")
+    progress = start_upload(symbol, file.filename, upload_id)
+    timeseries = await ensure_ohlc_collection(db, symbol)
+    try:
+        records_added = await ingest_upload(db[symbol], file.file, file.content_type == "application/zip", progress, timeseries)   #New Collection ohlc_data, might need changing
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to process file after {progress['rows']} records: {str(e)}")
+    finally:
+        # Also after a failed upload, its first batches may already be written
+        if progress["open_time_min"] is not None:
+            invalidate_cache(symbol, progress["open_time_min"], progress["open_time_max"])
+    await ensure_written_collection_indexes(db, symbol)
+    return {
+        "message": "File processed and data uploaded", "records_added": records_added,
+        "duplicates_skipped": progress["duplicates"], "upload_id": progress["upload_id"],
+    }
 
-    # Bulk insert into MongoDB
-    await db[symbol].insert_many(data_list)   #New Collection ohlc_data, might need changing
-    return {"message": "File processed and data uploaded", "records_added": len(data_list)}
+@router.get("/uploads/{upload_id}")
+async def get_upload_progress(upload_id: str):
+    """
+    Returns status, rows ingested and duplicates skipped so far of an upload to /upload-file
+    """
+    if upload_id not in uploads:
+        raise HTTPException(status_code=404, detail="Upload not found.")
+    return uploads[upload_id]
 
 # 3. Read Data with Filters
 
-@router.get("/data")
-async def get_data(symbol: str, start_date: Optional[str] = None, end_date: Optional[str] = None):
-    
+# Page size limits of /data and documents per MongoDB round trip while streaming
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 100_000
+STREAM_BATCH_SIZE = 5000
+
+# Helpers for the opaque continuation token of /data: the open_time (ms) of the last candle of the previous page
+def encode_cursor(open_time: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"after": open_time}).encode()).decode()
+
+def decode_cursor(token: str) -> int:
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(token.encode()))["after"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+def build_data_query(start_date: Optional[str], end_date: Optional[str], timeseries: bool, after: Optional[int] = None) -> dict:
     """
-    Returns Data from MongoDB with a symbol (i.e. BTCUSD), and a start end end date
+    Builds the MongoDB filter of /data for a collection of the given layout
     """
-    # Dynamically select the collection based on the symbol
-    collection = db[symbol]
-    
     # Initialize the query dictionary
     query = {}
+    open_time = {}
     
     # Apply start_date filter if provided (converted to milliseconds)
     if start_date:
         try:
             start_dt = datetime.fromisoformat(start_date)
             start_timestamp = datetime_to_timestamp(start_dt)
-            query["open_time"] = {"$gte": start_timestamp}
+            open_time["$gte"] = time_value(start_timestamp, timeseries)
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid start_date format. Please use ISO 8601 format.")
+
+    # Continue after the last candle of the previous page
+    if after is not None:
+        open_time["$gt"] = time_value(after, timeseries)
+    if open_time:
+        query["open_time"] = open_time
     
     # Apply end_date filter if provided (converted to milliseconds)
     if end_date:
@@ -89,19 +183,333 @@ async def get_data(symbol: str, start_date: Optional[str] = None, end_date: Opti
             end_dt = datetime.fromisoformat(end_date)
             end_timestamp = datetime_to_timestamp(end_dt)
             query["close_time"] = {"$lte": end_timestamp}
+            # Implied by close_time <= end (a candle opens before it closes), bounds the scan of the open_time index
+            query.setdefault("open_time", {})["$lte"] = time_value(end_timestamp, timeseries)
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid end_date format. Please use ISO 8601 format.")
+
+    return query
+
+# Helper for the normalized range of a /data request in milliseconds (None for unbounded), used for caching
+def data_range(start_date: Optional[str], end_date: Optional[str], after: Optional[int] = None):
+    start_ms = datetime_to_timestamp(datetime.fromisoformat(start_date)) if start_date else None
+    if after is not None:
+        start_ms = after + 1 if start_ms is None else max(start_ms, after + 1)
+    end_ms = datetime_to_timestamp(datetime.fromisoformat(end_date)) if end_date else None
+    return start_ms, end_ms
+
+# Helper for the response headers of /data
+def data_headers(next_cursor: Optional[str] = None, encoding: Optional[str] = None) -> dict:
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return headers
+
+# Generator for the stream of /data: candles are encoded (and compressed) in chunks of one cursor batch
+async def stream_candles(cursor, encoder, encoding: Optional[str]):
+    compression = compressor(encoding) if encoding else None
+    documents = []
+    async for document in cursor:
+        documents.append(from_storage(document))
+        if len(documents) >= STREAM_BATCH_SIZE:
+            chunk = encoder.encode(documents)
+            documents = []
+            if compression:
+                chunk = compression.compress(chunk)
+            if chunk:
+                yield chunk
+    chunk = (encoder.encode(documents) if documents else b"") + encoder.close()
+    if compression:
+        chunk = compression.compress(chunk) + compression.flush()
+    if chunk:
+        yield chunk
+
+@router.get("/data")
+async def get_data(
+    symbol: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    accept: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+):
     
-    # Query the dynamically selected collection
-    data = await collection.find(query, {"_id": 0}).to_list(1000)
+    """
+    Returns Data from MongoDB with a symbol (i.e. BTCUSD), and a start end end date\n
+    Candles are sorted by open_time and returned in pages of at most limit candles. If there may be more,
+    the X-Next-Cursor response header holds the cursor for the next page.\n
+    With stream=true the whole range is streamed as NDJSON (one candle per line) instead.\n
+    Send Accept: application/vnd.apache.arrow.stream for an Arrow IPC stream or application/x-msgpack for
+    MessagePack ({column: [values]} per page or batch), and Accept-Encoding: zstd or gzip for compression.\n
+    Pages are cached, pages of ranges that ended long ago until a write into their range.
+    """
+    media_type = negotiate_media_type(accept)
+    if media_type is None:
+        raise HTTPException(status_code=406, detail=f"Supported formats: {JSON}, {ARROW_STREAM}, {MSGPACK}.")
+    encoding = negotiate_encoding(accept_encoding)
+
+    # Dynamically select the collection based on the symbol
+    collection = db[symbol]
+    timeseries = await collection_is_timeseries(db, symbol)
+    after = decode_cursor(cursor) if cursor else None
+    query = build_data_query(start_date, end_date, timeseries, after)
+    start_ms, end_ms = data_range(start_date, end_date, after)
+
+    cache_key = ("data", symbol, start_ms, end_ms, limit, media_type, encoding)
+    if not stream:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            body, next_cursor, applied_encoding = cached
+            return Response(body, media_type=media_type, headers=data_headers(next_cursor, applied_encoding))
+    
+    # Iterate the dynamically selected collection in open_time order
+    candles = collection.find(query, {"_id": 0}).sort("open_time", 1)
+    if stream:
+        encoder = new_encoder(media_type, stream=True)
+        return StreamingResponse(
+            stream_candles(candles.batch_size(STREAM_BATCH_SIZE), encoder, encoding),
+            media_type=encoder.media_type, headers=data_headers(encoding=encoding),
+        )
+
+    data = await candles.limit(limit).to_list(limit)
+    data = [from_storage(document) for document in data]
 
     # If no data found
     if not data:
         raise HTTPException(status_code=404, detail="No data found for the given criteria.")
     
-    # Return the serialized data
+    # A full page means there may be more, hand out the cursor for the next one
+    next_cursor = encode_cursor(data[-1]["open_time"]) if len(data) == limit else None
     
-    return data
+    # Return the serialized data, and keep it for identical requests
+    with ENCODE_DURATION.labels(media_type).time():
+        body, applied_encoding = compress(encode_page(data, media_type), encoding)
+    response_cache.put(cache_key, (body, next_cursor, applied_encoding), len(body), symbol, start_ms, end_ms)
+    return Response(body, media_type=media_type, headers=data_headers(next_cursor, applied_encoding))
+
+# Multi-symbol reads: per-symbol queries running at the same time, at most MULTI_FETCH_CONCURRENCY per request
+MULTI_FETCH_CONCURRENCY = int(os.getenv("MULTI_FETCH_CONCURRENCY", "8"))
+MAX_BATCH_SYMBOLS = 100
+
+async def fetch_symbol(symbol: str, request: MultiSymbolQuery, semaphore: asyncio.Semaphore) -> list:
+    async with semaphore:
+        timeseries = await collection_is_timeseries(db, symbol)
+        query = build_data_query(request.start_date, request.end_date, timeseries)
+        projection = {"_id": 0}
+        if request.fields:
+            projection.update({field: 1 for field in ["open_time", *request.fields]})
+        data = await db[symbol].find(query, projection).sort("open_time", 1).limit(request.limit).to_list(request.limit)
+        return [from_storage(document) for document in data]
+
+@router.post("/data/batch")
+async def get_data_batch(request: MultiSymbolQuery):
+    """
+    Returns the candles of several symbols for the same range in one response, the queries run concurrently.\n
+    data holds the candles per symbol (at most limit each, sorted by open_time), as list of candles or with
+    columnar=true as {column: [values]}. Symbols with more candles in the range are listed in truncated,
+    fetch the rest from GET /data. Symbols without candles in the range are listed in missing.
+    """
+    symbols = list(dict.fromkeys(request.symbols))
+    if not symbols:
+        raise HTTPException(status_code=400, detail="No symbols given.")
+    if len(symbols) > MAX_BATCH_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SYMBOLS} symbols per request.")
+
+    semaphore = asyncio.Semaphore(MULTI_FETCH_CONCURRENCY)
+    results = await asyncio.gather(*(fetch_symbol(symbol, request, semaphore) for symbol in symbols))
+
+    data, missing, truncated = {}, [], []
+    for symbol, candles in zip(symbols, results):
+        if not candles:
+            missing.append(symbol)
+            continue
+        if len(candles) == request.limit:
+            truncated.append(symbol)
+        data[symbol] = to_columns(candles) if request.columnar else candles
+    # Candles are plain numbers already, only other values (i.e. datetimes of preprocessed collections) need jsonable_encoder
+    body = json.dumps({"data": data, "missing": missing, "truncated": truncated}, default=jsonable_encoder, separators=(",", ":"))
+    return Response(body, media_type=JSON)
+
+# Helper to collect stage and index names of a query plan (nested inputStage/inputStages)
+def plan_stages(plan: dict) -> list:
+    stages = [plan.get("stage") + (f" ({plan['indexName']})" if "indexName" in plan else "")]
+    children = plan.get("inputStages", []) + ([plan["inputStage"]] if "inputStage" in plan else [])
+    for child in children:
+        stages += plan_stages(child)
+    return stages
+
+@router.get("/debug/explain-data")
+async def explain_data(
+    symbol: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    ensure_index: bool = False,
+):
+    """
+    Runs the query GET /data would run with these parameters through explain (executionStats), to check that
+    it is served from an index (IXSCAN instead of COLLSCAN). ensure_index=true creates missing indexes first.
+    """
+    timeseries = await collection_is_timeseries(db, symbol)
+    query = build_data_query(start_date, end_date, timeseries, decode_cursor(cursor) if cursor else None)
+    created = await ensure_collection_indexes(db, symbol) if ensure_index else []
+
+    explain = await db.command({
+        "explain": {"find": symbol, "filter": query, "projection": {"_id": 0}, "sort": {"open_time": 1}, "limit": limit},
+        "verbosity": "executionStats",
+    })
+    stats = explain.get("executionStats", {})
+    winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+    winning_plan = winning_plan.get("queryPlan", winning_plan)  # slot based engine wraps the plan
+    return jsonable_encoder({
+        "filter": query,
+        "indexes_created": created,
+        "stages": plan_stages(winning_plan) if winning_plan else [],
+        "n_returned": stats.get("nReturned"),
+        "total_keys_examined": stats.get("totalKeysExamined"),
+        "total_docs_examined": stats.get("totalDocsExamined"),
+        "execution_time_ms": stats.get("executionTimeMillis"),
+        "explain": explain,
+    }, custom_encoder={ObjectId: str, Timestamp: str})
+
+# 3b. Server-side resampling
+
+# Interval units accepted by /ohlc, in milliseconds
+INTERVAL_UNITS = {"m": 60_000, "h": 3_600_000, "d": 86_400_000, "w": 604_800_000}
+
+# Binance weeks start on Monday, the epoch was a Thursday: weekly bars are counted from Monday 1970-01-05
+WEEK_ORIGIN_MS = 4 * INTERVAL_UNITS["d"]
+
+def parse_interval(interval: str) -> int:
+    try:
+        milliseconds = int(interval[:-1]) * INTERVAL_UNITS[interval[-1]]
+    except (ValueError, KeyError, IndexError):
+        milliseconds = 0
+    if milliseconds <= 0:
+        raise HTTPException(status_code=400, detail="Invalid interval. Use e.g. 15m, 1h, 4h or 1d.")
+    return milliseconds
+
+def resample_pipeline(query: dict, interval_ms: int, timeseries: bool, limit: int) -> list:
+    """
+    Aggregation pipeline that turns the 1m candles matching query into bars of interval_ms.
+    Bars are aligned like Binance klines: to multiples of the interval since the epoch,
+    and intervals of whole weeks to multiples since the first Monday after it.
+    """
+    open_time = {"$toLong": "$open_time"} if timeseries else "$open_time"
+    since_origin = open_time
+    if interval_ms % INTERVAL_UNITS["w"] == 0:
+        since_origin = {"$subtract": [open_time, WEEK_ORIGIN_MS]}
+    return [
+        {"$match": query},
+        {"$sort": {"open_time": 1}},
+        {"$group": {
+            "_id": {"$subtract": [open_time, {"$mod": [since_origin, interval_ms]}]},
+            "open": {"$first": "$open"},
+            "high": {"$max": "$high"},
+            "low": {"$min": "$low"},
+            "close": {"$last": "$close"},
+            "volume": {"$sum": "$volume"},
+            "quote_volume": {"$sum": "$quote_volume"},
+            "count": {"$sum": "$count"},
+            "taker_buy_base_volume": {"$sum": "$taker_buy_base_volume"},
+            "taker_buy_quote_volume": {"$sum": "$taker_buy_quote_volume"},
+        }},
+        {"$sort": {"_id": 1}},
+        {"$limit": limit},
+        {"$project": {
+            "_id": 0,
+            "open_time": "$_id",
+            "open": 1,
+            "high": 1,
+            "low": 1,
+            "close": 1,
+            "volume": 1,
+            "close_time": {"$add": ["$_id", interval_ms - 1]},
+            "quote_volume": 1,
+            "count": 1,
+            "taker_buy_base_volume": 1,
+            "taker_buy_quote_volume": 1,
+        }},
+    ]
+
+@router.get("/ohlc")
+async def get_ohlc(
+    response: Response,
+    symbol: str,
+    interval: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """
+    Returns OHLCV bars of the given interval (i.e. 15m, 1h, 1d) for a symbol, built from the 1m candles inside MongoDB:
+    first open, max high, min low, last close and summed volumes/counts per bar.\n
+    At most limit bars are returned per request. If the range holds more, the X-Next-Cursor response header
+    holds the cursor for the next page, same as for /data.
+    """
+    interval_ms = parse_interval(interval)
+    timeseries = await collection_is_timeseries(db, symbol)
+    query = build_data_query(start_date, end_date, timeseries, decode_cursor(cursor) if cursor else None)
+
+    # One bar more than requested tells whether there is a next page
+    pipeline = resample_pipeline(query, interval_ms, timeseries, limit + 1)
+    bars = await db[symbol].aggregate(pipeline, allowDiskUse=True).to_list(None)
+    if not bars:
+        raise HTTPException(status_code=404, detail="No data found for the given criteria.")
+    if len(bars) > limit:
+        bars = bars[:limit]
+        # The next page starts with the candles after the last bar
+        response.headers["X-Next-Cursor"] = encode_cursor(bars[-1]["close_time"])
+    return bars
+
+# 3c. Technical indicators
+
+# Helper to turn an array into a JSON-ready list with null for NaN
+def json_values(values: np.ndarray) -> list:
+    return np.where(np.isnan(values), None, values).tolist()
+
+@router.get("/indicators")
+async def get_indicators(
+    symbol: str,
+    indicators: str = ",".join(DEFAULT_INDICATORS),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """
+    Computes technical indicators (comma separated, i.e. rsi_14,sma_50,sma_200,ema_20,price_change) over the candles
+    of a symbol with open_time between start_date and end_date.\n
+    The candles before start_date the indicators need are loaded as well, so values are valid from the first candle on
+    (null where the series itself is too short). Results are cached, sliding requests only compute the new candles.
+    Returns {open_time: [...], close: [...], <indicator>: [...]} with at most limit candles.
+    """
+    try:
+        names = tuple(dict.fromkeys(name.strip().lower() for name in indicators.split(",") if name.strip()))
+        for name in names:
+            parse_indicator(name)
+        start_ms, end_ms = data_range(start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not names:
+        raise HTTPException(status_code=400, detail="No indicators given.")
+
+    timeseries = await collection_is_timeseries(db, symbol)
+    segment = await indicator_segment(db[symbol], symbol, timeseries, names, start_ms, end_ms, limit)
+    first = int(np.searchsorted(segment.open_time, start_ms)) if segment is not None and start_ms is not None else 0
+    last = int(np.searchsorted(segment.open_time, end_ms, side="right")) if segment is not None and end_ms is not None else None
+    if segment is None or first >= (last if last is not None else len(segment.open_time)):
+        raise HTTPException(status_code=404, detail="No data found for the given criteria.")
+    selected = slice(first, min(last if last is not None else len(segment.open_time), first + limit))
+
+    result = {"open_time": segment.open_time[selected].tolist(), "close": segment.close[selected].tolist()}
+    result.update({name: json_values(segment.columns[name][selected]) for name in names})
+    return Response(json.dumps(result, separators=(",", ":")), media_type=JSON)
 
 # Get Collection names Endpoint
 
@@ -110,32 +518,157 @@ async def get_trade_pairs():
     """
     Returns the names of all existing Collections in the DB
     """
-    collection_names = await db.list_collection_names()
+    collection_names = response_cache.get(TRADE_PAIRS_KEY)
+    if collection_names is None:
+        collection_names = await db.list_collection_names()
+        response_cache.put(TRADE_PAIRS_KEY, collection_names, sum(len(name) for name in collection_names))
     return collection_names
 
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """
+    Returns size, hit, miss and eviction counters of the response cache
+    """
+    return response_cache.stats()
+
+@router.delete("/cache")
+async def clear_cache(symbol: Optional[str] = None):
+    """
+    Drops the cached responses (of one symbol if given). Writes through the API invalidate the cache themselves,
+    this is for data loaded directly into MongoDB by the scripts.
+    """
+    if symbol:
+        dropped = response_cache.invalidate(symbol)
+        response_cache.discard(TRADE_PAIRS_KEY)
+    else:
+        dropped = response_cache.stats()["entries"]
+        response_cache.clear()
+    return {"message": "Cache cleared", "entries_dropped": dropped}
+
 
 
-@router.post("/run-script/{script_name}")
-async def run_script(script_name: str, script_args: ScriptArgs):
+# Runs a command in the script runner container and hands its output to write while it is produced.
+# The low-level exec API is used since exec_run(stream=True) does not report the exit code.
+def exec_streaming(command: str, write) -> int:
+    exec_id = client.api.exec_create(ubuntu_container.id, command, stdout=True, stderr=True, environment={"PYTHONUNBUFFERED": "1"})["Id"]
+    for chunk in client.api.exec_start(exec_id, stream=True):
+        write(chunk)
+    return client.api.exec_inspect(exec_id)["ExitCode"]
+
+# Seconds between keep-alive comments of the output stream, so proxies do not close idle connections
+SSE_KEEPALIVE = 15
+
+# Generator for the Server-Sent Events of a job: one event per output line (id = line number), then an "end" event
+async def stream_job_output(job_id: str, since: int = 0):
+    log = job_log(job_id)
+    loop = asyncio.get_running_loop()
+    event = asyncio.Event()
+    log.subscribe(loop, event)
+    try:
+        while True:
+            event.clear()
+            closed = log.closed
+            lines = log.since(since)
+            if lines and lines[0][0] > since + 1:
+                # This subscriber was too slow (or came late), the lines in between have left the ring buffer
+                yield f"event: skipped\ndata: {lines[0][0] - since - 1}\n\n"
+            for number, line in lines:
+                yield f"id: {number}\ndata: {line}\n\n"
+                since = number
+            if closed:
+                job = jobs.get(job_id, {})
+                yield f"event: end\ndata: {json.dumps({'status': job.get('status'), 'exit_code': job.get('exit_code')})}\n\n"
+                return
+            try:
+                await asyncio.wait_for(event.wait(), SSE_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+    finally:
+        log.unsubscribe(loop, event)
+
+def job_event_stream(job_id: str, since: int = 0) -> StreamingResponse:
+    return StreamingResponse(
+        stream_job_output(job_id, since), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/run-script/{script_name}", status_code=202)
+async def run_script(script_name: str, script_args: ScriptArgs, response: Response, wait: bool = False, stream: bool = False):
     # Check if the script file exists
     
     """
-    Run a script on the Ubuntu Script Runner container
+    Run a script on the Ubuntu Script Runner container\n
+    The run is queued as a job and the job id is returned right away, poll GET /jobs/{job_id} for status,
+    exit code, duration and output. With wait=true the response comes once the script has finished (like before).\n
+    With stream=true the output is streamed as Server-Sent Events while the script runs, see GET /jobs/{job_id}/stream.
     """
     script_path = f"/scripts/{script_name}"
     
     command = f"python3 {script_path} " + " ".join(script_args.args)
     
-    # Access the ubuntu_script_runner container
+    # Run the script inside the ubuntu container, in a worker thread of the job queue
     try:
-        # Run the script inside the ubuntu container
-        exit_code, output = ubuntu_container.exec_run(command, stdout=True, stderr=True)
-        if exit_code != 0:
-            return {"error": output.decode('utf-8')}
-        
-        return {"message": "Script executed successfully", "output": output.decode('utf-8')}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to execute script: {str(e)}")
+        job, finished = submit_job(script_name, script_args.args, lambda write: exec_streaming(command, write))
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=f"Too many queued script runs: {str(e)}")
+
+    if stream:
+        return job_event_stream(job["job_id"])
+    if not wait:
+        return {"message": "Script queued", "job_id": job["job_id"], "status": job["status"]}
+
+    job = await asyncio.wrap_future(finished)
+    response.status_code = 200
+    if job["error"]:
+        raise HTTPException(status_code=500, detail=f"Failed to execute script: {job['error']}")
+    if job["exit_code"] != 0:
+        return {"error": job["output"], "job_id": job["job_id"]}
+    return {"message": "Script executed successfully", "output": job["output"], "job_id": job["job_id"]}
+
+@router.get("/jobs")
+async def get_jobs():
+    """
+    Returns queue statistics and the most recent script jobs (without their output)
+    """
+    return {
+        **queue_stats(),
+        "jobs": [{key: value for key, value in job.items() if key != "output"} for job in list(jobs.values())],
+    }
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Returns status, exit code, duration and output of a script job
+    """
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    job = jobs[job_id]
+    if job["status"] == "running":
+        # Output so far (the last SCRIPT_LOG_LINES lines)
+        return {**job, "output": job_log(job_id).text()}
+    return job
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_job(job_id: str, since: int = 0, last_event_id: Optional[int] = Header(None)):
+    """
+    Streams the output of a script job as Server-Sent Events, one event per line (the event id is the line number).
+    Subscribers get the lines still held in the ring buffer first (the last SCRIPT_LOG_LINES lines), pass since
+    (or Last-Event-ID when reconnecting) to continue after a line. An "end" event with status and exit code closes the stream.
+    """
+    if job_id not in jobs or job_log(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job_event_stream(job_id, last_event_id if last_event_id is not None else since)
+
+@router.delete("/jobs/{job_id}")
+async def delete_job(job_id: str):
+    """
+    Cancels a script job that is still queued
+    """
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if not cancel_job(job_id):
+        raise HTTPException(status_code=409, detail=f"Job is {jobs[job_id]['status']}, only queued jobs can be cancelled.")
+    return {"message": "Job cancelled", "job_id": job_id}
 
 @router.get("/scripts-available")
 async def get_script_files():
@@ -0,0 +1,221 @@
+# app/jobs.py
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from metrics import SCRIPT_RUN_DURATION
+
+# Script runs are jobs: they wait in a queue and run on a bounded thread pool, so a long exec_run never blocks the
+# event loop. At most SCRIPT_WORKERS scripts run at once, and at most SCRIPT_MAX_PER_SCRIPT runs of the same script
+# (SCRIPT_LIMITS overrides that per script, e.g. "training.py=1,preprocessing.py=2").
+SCRIPT_WORKERS = int(os.getenv("SCRIPT_WORKERS", "4"))
+SCRIPT_MAX_PER_SCRIPT = int(os.getenv("SCRIPT_MAX_PER_SCRIPT", "1"))
+SCRIPT_LIMITS = {
+    name.strip(): int(limit)
+    for name, limit in (item.split("=") for item in os.getenv("SCRIPT_LIMITS", "").split(",") if "=" in item)
+}
+MAX_QUEUED_JOBS = int(os.getenv("SCRIPT_MAX_QUEUED_JOBS", "100"))
+
+# Output of a run is kept in a ring buffer of the last SCRIPT_LOG_LINES lines (each cut to MAX_LINE_LENGTH characters),
+# so scripts that never exit (prediction.py) do not grow the memory of the API
+SCRIPT_LOG_LINES = int(os.getenv("SCRIPT_LOG_LINES", "1000"))
+MAX_LINE_LENGTH = 4096
+
+# Status of the most recent jobs, by job id
+MAX_TRACKED_JOBS = 200
+jobs = OrderedDict()
+
+
+class QueueFull(Exception):
+    pass
+
+
+class RunLog:
+    """
+    Ring buffer of the output lines of one run. Lines are numbered from 1, so subscribers can continue
+    after the last line they have seen. Written from the worker thread, read from the event loop.
+    """
+
+    def __init__(self, max_lines=SCRIPT_LOG_LINES):
+        self._lines = deque(maxlen=max_lines)
+        self._partial = ""
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self.last_seq = 0
+        self.closed = False
+
+    def write(self, chunk: bytes):
+        """
+        Takes a chunk of output as produced by the process, complete lines go into the buffer
+        """
+        text = self._partial + chunk.decode("utf-8", errors="replace")
+        *lines, self._partial = text.split("\n")
+        if len(self._partial) > MAX_LINE_LENGTH:
+            lines.append(self._partial)
+            self._partial = ""
+        if lines:
+            self._append(lines)
+
+    def close(self):
+        if self._partial:
+            self._append([self._partial])
+            self._partial = ""
+        self.closed = True
+        self._notify()
+
+    def since(self, seq: int) -> list:
+        """
+        Returns the buffered (seq, line) pairs after seq. Lines already pushed out of the buffer are skipped.
+        """
+        with self._lock:
+            first = self.last_seq - len(self._lines) + 1
+            return [(number, line) for number, line in enumerate(self._lines, first) if number > seq]
+
+    def text(self) -> str:
+        with self._lock:
+            return "".join(line + "\n" for line in self._lines)
+
+    def subscribe(self, loop, event):
+        with self._lock:
+            self._subscribers.add((loop, event))
+
+    def unsubscribe(self, loop, event):
+        with self._lock:
+            self._subscribers.discard((loop, event))
+
+    def _append(self, lines: list):
+        with self._lock:
+            for line in lines:
+                self._lines.append(line[:MAX_LINE_LENGTH])
+            self.last_seq += len(lines)
+        self._notify()
+
+    # Wakes up the subscribers waiting on their event loop
+    def _notify(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, event in subscribers:
+            loop.call_soon_threadsafe(event.set)
+
+
+_executor = ThreadPoolExecutor(max_workers=SCRIPT_WORKERS, thread_name_prefix="script-job")
+_lock = threading.Lock()
+_pending = deque()   # job ids waiting for a free worker / script slot, oldest first
+_running = {}        # script name -> number of running jobs
+_runs = {}           # job id -> callable doing the actual run, see submit_job()
+_futures = {}        # job id -> Future of a queued or running job, resolved with the job record once it finished
+_logs = OrderedDict()  # job id -> RunLog of the job
+
+
+def script_limit(script_name: str) -> int:
+    return SCRIPT_LIMITS.get(script_name, SCRIPT_MAX_PER_SCRIPT)
+
+
+def submit_job(script_name: str, args: list, run) -> tuple:
+    """
+    Queues a run of script_name. run(write) is called in a worker thread, it passes the output to write
+    as it is produced and returns the exit code.
+    Returns the job record and a Future resolved with it once the job finished or was cancelled (await it with
+    asyncio.wrap_future), raises QueueFull if MAX_QUEUED_JOBS jobs are already waiting.
+    """
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "script": script_name,
+        "args": args,
+        "status": "queued",
+        "exit_code": None,
+        "submitted": datetime.utcnow(),
+        "started": None,
+        "finished": None,
+        "duration": None,
+        "output": None,
+        "error": None,
+    }
+    with _lock:
+        if len(_pending) >= MAX_QUEUED_JOBS:
+            raise QueueFull(f"{len(_pending)} jobs are already queued.")
+        jobs[job["job_id"]] = job
+        while len(jobs) > MAX_TRACKED_JOBS:
+            # Only forget finished jobs, queued and running ones are still referenced
+            oldest = next((job_id for job_id, record in jobs.items() if record["finished"] is not None), None)
+            if oldest is None:
+                break
+            del jobs[oldest]
+            _logs.pop(oldest, None)
+        _runs[job["job_id"]] = run
+        _logs[job["job_id"]] = RunLog()
+        future = _futures[job["job_id"]] = Future()
+        _pending.append(job["job_id"])
+        _dispatch()
+    return job, future
+
+
+def job_log(job_id: str) -> RunLog:
+    return _logs.get(job_id)
+
+
+def cancel_job(job_id: str) -> bool:
+    """
+    Removes a job that is still queued. Running jobs cannot be cancelled.
+    """
+    with _lock:
+        if job_id not in _pending:
+            return False
+        _pending.remove(job_id)
+        _runs.pop(job_id)
+        job = jobs[job_id]
+        job.update(status="cancelled", finished=datetime.utcnow())
+        _logs[job_id].close()
+        _futures.pop(job_id).set_result(job)
+    return True
+
+
+def queue_stats() -> dict:
+    with _lock:
+        return {
+            "workers": SCRIPT_WORKERS,
+            "queued": len(_pending),
+            "running": sum(_running.values()),
+            "running_per_script": dict(_running),
+        }
+
+
+# Starts queued jobs in order as long as there are free workers, skipping scripts that are at their limit.
+# Called with _lock held.
+def _dispatch():
+    for job_id in list(_pending):
+        if sum(_running.values()) >= SCRIPT_WORKERS:
+            return
+        script_name = jobs[job_id]["script"]
+        if _running.get(script_name, 0) >= script_limit(script_name):
+            continue
+        _pending.remove(job_id)
+        _running[script_name] = _running.get(script_name, 0) + 1
+        jobs[job_id].update(status="running", started=datetime.utcnow())
+        _executor.submit(_run_job, job_id, _runs.pop(job_id))
+
+
+# Runs in a worker thread
+def _run_job(job_id: str, run):
+    job = jobs[job_id]
+    log = _logs[job_id]
+    start = time.perf_counter()
+    try:
+        exit_code = run(log.write)
+        job.update(status="done" if exit_code == 0 else "failed", exit_code=exit_code)
+    except Exception as e:
+        job.update(status="failed", error=str(e))
+    finally:
+        log.close()
+        job.update(output=log.text(), finished=datetime.utcnow(), duration=time.perf_counter() - start)
+        SCRIPT_RUN_DURATION.labels(job["script"], job["status"]).observe(job["duration"])
+        with _lock:
+            _running[job["script"]] -= 1
+            if not _running[job["script"]]:
+                del _running[job["script"]]
+            _futures.pop(job_id).set_result(job)
+            _dispatch()
@@ -1,7 +1,12 @@
 # app/main.py
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 import items
+from write_buffer import write_buffer, WRITE_BEHIND
+from indexes import ensure_indexes, ENSURE_INDEXES
+from database import db
+from metrics import MetricsMiddleware, metrics_response
+import asyncio
 
 
 app = FastAPI(
@@ -13,6 +18,31 @@ app = FastAPI(
 # Include the items router
 app.include_router(items.router, tags=["items"])
 
+# Request metrics for /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Start the write-behind flusher and flush what is left on shutdown
+@app.on_event("startup")
+async def start_write_buffer():
+    if WRITE_BEHIND:
+        await write_buffer.start()
+
+# Check the indexes of all collections in the background, building them on big collections takes a while
+@app.on_event("startup")
+async def start_index_check():
+    if ENSURE_INDEXES:
+        app.state.index_check = asyncio.create_task(ensure_indexes(db))
+
+@app.on_event("shutdown")
+async def stop_write_buffer():
+    await write_buffer.stop()
+
+# Prometheus metrics
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    body, content_type = metrics_response()
+    return Response(body, headers={"Content-Type": content_type})
+
 # Root route
 @app.get("/")
 def read_root():
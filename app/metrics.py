@@ -0,0 +1,121 @@
+# app/metrics.py
+
+import time
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from pymongo import monitoring
+from starlette.routing import Match
+
+# Prometheus metrics of the API, served by GET /metrics. Everything on the request path is a dict lookup
+# and a few counter increments, no locks of our own and no I/O.
+
+# Request latencies from 1 ms up to the long /run-script?wait=true and /data streams
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+SCRIPT_BUCKETS = (1, 5, 15, 30, 60, 300, 900, 1800, 3600, 7200)
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time until the response is complete", ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being processed", ["method", "route"])
+REQUEST_SIZE = Histogram("http_request_size_bytes", "Request body size (Content-Length)", ["method", "route"], buckets=SIZE_BUCKETS)
+RESPONSE_SIZE = Histogram("http_response_size_bytes", "Response body size as sent", ["method", "route"], buckets=SIZE_BUCKETS)
+
+MONGO_COMMAND_DURATION = Histogram(
+    "mongodb_command_duration_seconds", "Duration of MongoDB commands as seen by the driver", ["command", "collection"],
+    buckets=LATENCY_BUCKETS,
+)
+MONGO_COMMAND_FAILURES = Counter("mongodb_command_failures_total", "Failed MongoDB commands", ["command", "collection"])
+
+ENCODE_DURATION = Histogram("response_encode_duration_seconds", "Time spent encoding /data pages", ["format"], buckets=LATENCY_BUCKETS)
+
+SCRIPT_RUN_DURATION = Histogram(
+    "script_run_duration_seconds", "Duration of script runs started via /run-script", ["script", "status"],
+    buckets=SCRIPT_BUCKETS,
+)
+
+# Route label of requests that match no route, so unknown paths do not create new time series
+UNMATCHED_ROUTE = "unmatched"
+
+
+def metrics_response() -> tuple:
+    """
+    Returns body and content type of the Prometheus exposition
+    """
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware measuring every HTTP request by route template (e.g. /jobs/{job_id}), method and status.
+    Written as plain ASGI middleware so streaming responses are measured until their last chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _route(self, scope) -> str:
+        for route in scope["app"].router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return UNMATCHED_ROUTE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._route(scope)
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length:
+            REQUEST_SIZE.labels(method, route).observe(int(content_length))
+
+        status = "500"
+        sent = 0
+
+        async def measured_send(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(method, route)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, measured_send)
+        finally:
+            in_flight.dec()
+            REQUEST_DURATION.labels(method, route, status).observe(time.perf_counter() - start)
+            RESPONSE_SIZE.labels(method, route).observe(sent)
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    Times every command the Motor client sends, by command name and collection
+    """
+
+    def __init__(self):
+        self._started = {}  # (connection, request id) -> (command, collection)
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            # getMore carries the cursor id there, the collection is in 'collection'
+            collection = event.command.get("collection", "")
+        self._started[(event.connection_id, event.request_id)] = (event.command_name, collection)
+
+    def succeeded(self, event):
+        labels = self._started.pop((event.connection_id, event.request_id), None)
+        if labels is not None:
+            MONGO_COMMAND_DURATION.labels(*labels).observe(event.duration_micros / 1_000_000)
+
+    def failed(self, event):
+        labels = self._started.pop((event.connection_id, event.request_id), None)
+        if labels is not None:
+            MONGO_COMMAND_DURATION.labels(*labels).observe(event.duration_micros / 1_000_000)
+            MONGO_COMMAND_FAILURES.labels(*labels).inc()
@@ -1,6 +1,7 @@
 # app/models.py
 
 from pydantic import BaseModel, Field
+from typing import Optional
 from bson import ObjectId
 from database import PyObjectId
 
@@ -23,5 +24,13 @@ class OHLCDataModel(BaseModel):
         arbitrary_types_allowed = False
         json_encoders = {ObjectId: str}
 
+class MultiSymbolQuery(BaseModel):
+    symbols: list[str]  # Collections to read, i.e. ["BTCUSDT", "ETHUSDT"]
+    start_date: Optional[str] = None  # ISO 8601, same as for GET /data
+    end_date: Optional[str] = None
+    fields: Optional[list[str]] = None  # Projection, open_time is always included. All fields if not set
+    limit: int = Field(1000, ge=1, le=100_000)  # Candles per symbol
+    columnar: bool = False  # {column: [values]} per symbol instead of a list of candles
+
 class ScriptArgs(BaseModel):
     args: list[str]  # This will hold the list of arguments to pass to the script
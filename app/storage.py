@@ -0,0 +1,105 @@
+# app/storage.py
+
+import os
+from datetime import datetime, timezone
+import pandas as pd
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+# How OHLC collections are created: "documents" (plain collection per symbol, the default)
+# or "timeseries" (MongoDB time-series collection, bucketed and compressed per symbol and minute)
+OHLC_STORAGE = os.getenv("OHLC_STORAGE", "documents")
+
+# Time-series collections need a BSON date as time field, so open_time is stored as datetime there.
+# The symbol goes into 'key', the same field read_to_db_neha.py tags candles with.
+TIME_FIELD = "open_time"
+META_FIELD = "key"
+TIMESERIES_OPTIONS = {"timeField": TIME_FIELD, "metaField": META_FIELD, "granularity": "minutes"}
+
+
+def use_timeseries() -> bool:
+    return OHLC_STORAGE == "timeseries"
+
+
+def is_timeseries(collection_info: dict) -> bool:
+    """
+    Takes an entry of db.list_collections() (or None for a missing collection)
+    """
+    return bool(collection_info) and collection_info.get("type") == "timeseries"
+
+
+# Helpers to convert between epoch milliseconds (API, CSVs) and the datetimes of time-series collections
+def ms_to_datetime(ms: int) -> datetime:
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).replace(tzinfo=None)
+
+
+def datetime_to_ms(dt: datetime) -> int:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def time_value(ms: int, timeseries: bool):
+    """
+    Converts an open_time in milliseconds into what is stored in a collection of the given layout
+    """
+    return ms_to_datetime(ms) if timeseries else ms
+
+
+def to_storage(document: dict, symbol: str, timeseries: bool) -> dict:
+    """
+    Converts a candle with millisecond open_time into the document stored in a collection of the given layout
+    """
+    if not timeseries:
+        return document
+    return {**document, TIME_FIELD: ms_to_datetime(document[TIME_FIELD]), META_FIELD: symbol}
+
+
+def to_storage_frame(df: pd.DataFrame, timeseries: bool) -> pd.DataFrame:
+    """
+    Same as to_storage() for a whole DataFrame of candles. The meta field is added by the caller (iter_documents extra).
+    """
+    if not timeseries:
+        return df
+    df = df.copy()
+    df[TIME_FIELD] = pd.to_datetime(df[TIME_FIELD], unit="ms")
+    return df
+
+
+def from_storage(document: dict) -> dict:
+    """
+    Converts a stored candle back to the API representation with open_time in milliseconds
+    """
+    open_time = document.get(TIME_FIELD)
+    if isinstance(open_time, datetime):
+        document[TIME_FIELD] = datetime_to_ms(open_time)
+    return document
+
+
+# Motor helpers for the API. Layouts are cached once a collection exists, they do not change afterwards.
+_layouts = {}
+
+
+async def collection_is_timeseries(db, name: str) -> bool:
+    if name in _layouts:
+        return _layouts[name]
+    result = await db.command("listCollections", filter={"name": name})
+    infos = result["cursor"]["firstBatch"]
+    if not infos:
+        return use_timeseries()
+    _layouts[name] = is_timeseries(infos[0])
+    return _layouts[name]
+
+
+async def ensure_ohlc_collection(db, name: str) -> bool:
+    """
+    Creates the collection as time-series collection if that storage mode is enabled and it does not exist yet.
+    Returns whether the collection is a time-series collection.
+    """
+    timeseries = await collection_is_timeseries(db, name)
+    if timeseries and name not in _layouts:
+        try:
+            await db.create_collection(name, timeseries=TIMESERIES_OPTIONS)
+        except (CollectionInvalid, OperationFailure):
+            pass  # created concurrently by another request
+        _layouts[name] = True
+    return timeseries
@@ -0,0 +1,136 @@
+# app/uploads.py
+
+import asyncio
+import threading
+import uuid
+import zipfile
+from collections import OrderedDict
+from datetime import datetime
+from pymongo.errors import BulkWriteError
+from columnar import read_ohlc_csv, iter_documents
+from indexes import duplicate_positions
+from storage import to_storage_frame, META_FIELD, TIME_FIELD
+
+# Rows parsed per read_csv chunk, and the number of document batches that may wait for or sit in insert_many
+UPLOAD_CHUNK_ROWS = 50_000
+MAX_IN_FLIGHT_BATCHES = 4
+
+# Progress of the most recent uploads, by upload id
+MAX_TRACKED_UPLOADS = 100
+uploads = OrderedDict()
+
+
+def start_upload(symbol: str, filename: str, upload_id: str = None) -> dict:
+    """
+    Registers a new upload and returns its progress record. Clients may pick the upload id themselves,
+    so they can poll GET /uploads/{upload_id} while the upload request is still running.
+    """
+    upload_id = upload_id or uuid.uuid4().hex
+    progress = {
+        "upload_id": upload_id,
+        "symbol": symbol,
+        "filename": filename,
+        "status": "running",
+        "rows": 0,
+        "duplicates": 0,
+        "open_time_min": None,
+        "open_time_max": None,
+        "started": datetime.utcnow(),
+        "finished": None,
+        "error": None,
+    }
+    uploads[upload_id] = progress
+    while len(uploads) > MAX_TRACKED_UPLOADS:
+        uploads.popitem(last=False)
+    return progress
+
+
+# Runs in a worker thread: parses the upload chunk by chunk and hands document batches to the event loop
+def _produce_batches(source, is_zip, extra, timeseries, loop, queue, stop, progress):
+    def put(item):
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def frames():
+        if is_zip:
+            with zipfile.ZipFile(source) as zip_file:
+                for filename in zip_file.namelist():
+                    if filename.endswith(".csv"):
+                        with zip_file.open(filename) as csv_file:
+                            yield from read_ohlc_csv(csv_file, chunksize=UPLOAD_CHUNK_ROWS)
+        else:
+            yield from read_ohlc_csv(source, chunksize=UPLOAD_CHUNK_ROWS)
+
+    try:
+        for df in frames():
+            # Range of the parsed candles (ms), tells /upload-file which cached responses to invalidate
+            if not df.empty:
+                first, last = int(df[TIME_FIELD].min()), int(df[TIME_FIELD].max())
+                progress["open_time_min"] = min(first, progress["open_time_min"] if progress["open_time_min"] is not None else first)
+                progress["open_time_max"] = max(last, progress["open_time_max"] if progress["open_time_max"] is not None else last)
+            for batch in iter_documents(to_storage_frame(df, timeseries), extra=extra):
+                if stop.is_set():
+                    return
+                put(batch)
+    except Exception as e:
+        put(e)
+    finally:
+        put(None)
+
+
+async def ingest_upload(collection, source, is_zip: bool, progress: dict, timeseries: bool = False) -> int:
+    """
+    Streams a CSV or ZIP file object into collection (stored in time-series layout if timeseries is set). Parsing runs in a thread so the event loop stays free,
+    the bounded queue and semaphore keep at most MAX_IN_FLIGHT_BATCHES batches in memory / in flight.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=MAX_IN_FLIGHT_BATCHES)
+    in_flight = asyncio.Semaphore(MAX_IN_FLIGHT_BATCHES)
+    stop = threading.Event()
+    tasks = set()
+
+    async def insert(batch):
+        try:
+            await collection.insert_many(batch, ordered=False)
+            progress["rows"] += len(batch)
+        except BulkWriteError as e:
+            # Candles already stored are skipped (unique open_time index), the others are written
+            rejected = duplicate_positions(e)
+            if rejected is None:
+                raise
+            progress["rows"] += len(batch) - len(rejected)
+            progress["duplicates"] += len(rejected)
+        finally:
+            in_flight.release()
+
+    extra = {META_FIELD: progress["symbol"]} if timeseries else None
+    producer = loop.run_in_executor(None, _produce_batches, source, is_zip, extra, timeseries, loop, queue, stop, progress)
+    producer_finished = False
+    try:
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                producer_finished = True
+                break
+            if isinstance(batch, Exception):
+                raise batch
+            await in_flight.acquire()
+            tasks.add(asyncio.create_task(insert(batch)))
+            # Surface insert errors early instead of after the whole file was parsed
+            for done in [task for task in tasks if task.done()]:
+                tasks.discard(done)
+                done.result()
+        await asyncio.gather(*tasks)
+    except BaseException as e:
+        stop.set()
+        for task in tasks:
+            task.cancel()
+        # Unblock the producer thread, it always finishes with a None sentinel
+        while not producer_finished:
+            producer_finished = await queue.get() is None
+        progress.update(status="failed", error=str(e), finished=datetime.utcnow())
+        raise
+    finally:
+        await producer
+
+    progress.update(status="done", finished=datetime.utcnow())
+    return progress["rows"]
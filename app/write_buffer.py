@@ -0,0 +1,162 @@
+# app/write_buffer.py
+
+import asyncio
+import logging
+import os
+from datetime import datetime
+from pymongo import WriteConcern
+from pymongo.errors import BulkWriteError
+from database import db
+from cache import response_cache
+from indexes import ensure_written_collection_indexes, DUPLICATE_KEY
+from storage import TIME_FIELD, datetime_to_ms
+
+# Write-behind mode for /data-point and /data-points: candles are collected per symbol and written with
+# one insert_many once FLUSH_SIZE candles are waiting or FLUSH_INTERVAL seconds have passed
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "0") == "1"
+FLUSH_SIZE = int(os.getenv("WRITE_BEHIND_FLUSH_SIZE", "500"))
+FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "1.0"))
+
+# Flushes that somebody waits for are journaled before they are acknowledged
+DURABLE = WriteConcern(w=1, j=True)
+
+# Failed flushes after which documents nobody waits for are dropped instead of queued again,
+# so a persistent error (e.g. a validation failure) does not grow the buffer forever
+MAX_FLUSH_ATTEMPTS = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", "5"))
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBuffer:
+    def __init__(self, database, flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL, max_attempts=MAX_FLUSH_ATTEMPTS):
+        self.db = database
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self._documents = {}  # symbol -> pending documents
+        self._waiters = {}    # symbol -> futures of callers waiting for the next flush of that symbol
+        self._attempts = {}   # _id -> failed flushes of a queued document
+        self._flush_task = None
+        self._background = set()
+
+    async def add(self, symbol: str, documents: list, wait: bool = False):
+        """
+        Queues documents (each with an _id) for symbol. With wait=True this returns only once they are written and
+        journaled. Errors of that write are raised to the caller as insert_many(ordered=False) of its own documents
+        would raise them, e.g. a BulkWriteError for candles that are already stored. Without it, the call returns
+        immediately, and documents of a flush that fails as a whole are queued again.
+        """
+        self._documents.setdefault(symbol, []).extend(documents)
+        waiter = None
+        if wait:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.setdefault(symbol, []).append((waiter, [document["_id"] for document in documents]))
+
+        if len(self._documents[symbol]) >= self.flush_size:
+            task = asyncio.create_task(self.flush(symbol))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+
+        if waiter is not None:
+            await waiter
+
+    async def flush(self, symbol: str):
+        documents = self._documents.pop(symbol, [])
+        waiters = self._waiters.pop(symbol, [])
+        if not documents:
+            return
+        collection = self.db[symbol]
+        if waiters:
+            collection = collection.with_options(write_concern=DURABLE)
+        write_errors = {}  # _id -> write error of the documents that were rejected
+        try:
+            await collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            if e.details.get("writeConcernErrors"):
+                self._fail(symbol, documents, waiters, e)
+                return
+            # Rejected documents fail on their own, the others are written
+            write_errors = {documents[item["index"]]["_id"]: item for item in e.details.get("writeErrors", [])}
+        except Exception as e:
+            self._fail(symbol, documents, waiters, e)
+            return
+
+        for document in documents:
+            self._attempts.pop(document["_id"], None)
+        duplicates = sum(item["code"] == DUPLICATE_KEY for item in write_errors.values())
+        if duplicates:
+            logger.info("Write-behind flush into %s skipped %d candles that were already stored.", symbol, duplicates)
+        if len(write_errors) > duplicates:
+            error = next(item for item in write_errors.values() if item["code"] != DUPLICATE_KEY)
+            logger.error("Write-behind flush into %s rejected %d candles: %s", symbol, len(write_errors) - duplicates, error.get("errmsg"))
+
+        written = [document for document in documents if document["_id"] not in write_errors]
+        if written:
+            # Responses cached between add() and now do not contain these candles yet
+            open_times = [document[TIME_FIELD] for document in written]
+            first, last = min(open_times), max(open_times)
+            if isinstance(first, datetime):
+                first, last = datetime_to_ms(first), datetime_to_ms(last)
+            response_cache.invalidate(symbol, first, last)
+            await ensure_written_collection_indexes(self.db, symbol)
+
+        for waiter, ids in waiters:
+            if waiter.done():
+                continue
+            errors = [{**write_errors[_id], "index": position} for position, _id in enumerate(ids) if _id in write_errors]
+            if errors:
+                waiter.set_exception(BulkWriteError({
+                    "writeErrors": errors, "writeConcernErrors": [], "nInserted": len(ids) - len(errors),
+                }))
+            else:
+                waiter.set_result(len(ids))
+
+    def _fail(self, symbol, documents, waiters, error):
+        # Callers waiting for the flush get the error, the documents nobody waits for are written with the next flush,
+        # until they failed max_attempts times
+        acknowledged = {_id for waiter, ids in waiters if not waiter.done() for _id in ids}
+        retry, dropped = [], 0
+        for document in documents:
+            if document["_id"] in acknowledged:
+                continue
+            attempts = self._attempts.get(document["_id"], 0) + 1
+            if attempts >= self.max_attempts:
+                self._attempts.pop(document["_id"], None)
+                dropped += 1
+                continue
+            self._attempts[document["_id"]] = attempts
+            retry.append(document)
+        if retry:
+            self._documents[symbol] = retry + self._documents.get(symbol, [])
+        logger.warning("Write-behind flush of %d documents into %s failed, %d are queued again: %s", len(documents), symbol, len(retry), error)
+        if dropped:
+            logger.error("Dropped %d documents of %s after %d failed write-behind flushes.", dropped, symbol, self.max_attempts)
+        for waiter, _ in waiters:
+            if not waiter.done():
+                waiter.set_exception(error)
+
+    async def flush_all(self):
+        await asyncio.gather(*(self.flush(symbol) for symbol in list(self._documents)))
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush_all()
+
+    async def start(self):
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await asyncio.gather(*self._background, return_exceptions=True)
+        await self.flush_all()
+        # What is left was queued again after a failed flush, and nobody flushes it anymore
+        lost = sum(len(documents) for documents in self._documents.values())
+        if lost:
+            logger.error("Write-behind buffer stopped with %d unwritten documents, they are lost.", lost)
+
+
+write_buffer = WriteBuffer(db)
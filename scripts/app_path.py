@@ -0,0 +1,9 @@
+import os
+import sys
+
+# app/ holds the OHLC schema and helpers shared with the API (columnar.py, ...).
+# The script runner container mounts it at APP_DIR, in a checkout it sits next to scripts/.
+APP_DIR = os.getenv("APP_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "app"))
+
+if APP_DIR not in sys.path:
+    sys.path.append(APP_DIR)
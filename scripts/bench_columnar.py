@@ -0,0 +1,88 @@
+import io
+import time
+import argparse
+import tracemalloc
+import zipfile
+import numpy as np
+import pandas as pd
+import app_path  # makes the shared modules in app/ importable
+from bson import BSON
+from columnar import read_ohlc_csv, iter_documents, OHLC_COLUMNS
+
+# One month of 1m candles
+MONTH_ROWS = 31 * 24 * 60
+
+# Function to build a CSV that looks like a Binance kline export
+def synthetic_csv(rows):
+    rng = np.random.default_rng(42)
+    open_time = 1698796800000 + np.arange(rows, dtype=np.int64) * 60_000
+    close = 35000 + np.cumsum(rng.normal(0, 10, rows))
+    df = pd.DataFrame({
+        "open_time": open_time,
+        "open": close + rng.normal(0, 2, rows),
+        "high": close + 10,
+        "low": close - 10,
+        "close": close,
+        "volume": rng.random(rows) * 5,
+        "close_time": open_time + 59_999,
+        "quote_volume": rng.random(rows) * 150000,
+        "count": rng.integers(1, 500, rows),
+        "taker_buy_base_volume": rng.random(rows) * 2,
+        "taker_buy_quote_volume": rng.random(rows) * 70000,
+    }, columns=OHLC_COLUMNS)
+    return df.to_csv(index=False).encode()
+
+# Function to load the first CSV of a real archive
+def csv_from_zip(zip_path):
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        name = next(name for name in zip_ref.namelist() if name.endswith(".csv"))
+        return zip_ref.read(name)
+
+# Previous path: untyped read_csv and one dict per row for the whole file
+def records_path(raw, encode):
+    data = pd.read_csv(io.BytesIO(raw)).to_dict(orient='records')
+    if encode:
+        for record in data:
+            BSON.encode(record)
+    return len(data)
+
+# New path: typed read_csv and lazily built batches
+def columnar_path(raw, encode):
+    rows = 0
+    for batch in iter_documents(read_ohlc_csv(io.BytesIO(raw))):
+        if encode:
+            for document in batch:
+                BSON.encode(document)
+        rows += len(batch)
+    return rows
+
+# Function to time a path and measure its peak Python heap
+def measure(func, raw, encode, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = func(raw, encode)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func(raw, encode)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rows, min(timings), peak
+
+def main(zip_path, rows, repeat, encode):
+    raw = csv_from_zip(zip_path) if zip_path else synthetic_csv(rows)
+    print(f"CSV size: {len(raw) / 1_000_000:.1f} MB, BSON encoding {'on' if encode else 'off'}")
+
+    for name, func in [("to_dict(records)", records_path), ("columnar batches", columnar_path)]:
+        count, seconds, peak = measure(func, raw, encode, repeat)
+        print(f"{name:>18}: {count} rows in {seconds:.3f}s ({count / seconds:,.0f} rows/s), peak heap {peak / 1_000_000:.1f} MB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark DataFrame.to_dict against the columnar document builder.")
+    parser.add_argument('--zip', type=str, help="Binance kline ZIP to use instead of synthetic data", default=None)
+    parser.add_argument('--rows', type=int, help="Rows of synthetic data (default: one month of 1m candles)", default=MONTH_ROWS)
+    parser.add_argument('--repeat', type=int, help="Timed runs per path, the best one is reported", default=3)
+    parser.add_argument('--no-encode', action='store_true', help="Skip BSON encoding of the documents")
+
+    args = parser.parse_args()
+    main(args.zip, args.rows, args.repeat, not args.no_encode)
@@ -0,0 +1,80 @@
+import json
+import time
+import gzip
+import argparse
+import msgpack
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import zstandard
+import app_path  # makes the shared modules in app/ importable
+from columnar import iter_documents, OHLC_COLUMNS
+from formats import JSON, ARROW_STREAM, MSGPACK, encode_page, compress
+
+# Function to build candles the way /data gets them from the cursor: one dict per candle
+def synthetic_candles(rows):
+    rng = np.random.default_rng(42)
+    open_time = 1698796800000 + np.arange(rows, dtype=np.int64) * 60_000
+    close = 35000 + np.cumsum(rng.normal(0, 10, rows))
+    df = pd.DataFrame({
+        "open_time": open_time,
+        "open": close + rng.normal(0, 2, rows),
+        "high": close + 10,
+        "low": close - 10,
+        "close": close,
+        "volume": rng.random(rows) * 5,
+        "close_time": open_time + 59_999,
+        "quote_volume": rng.random(rows) * 150000,
+        "count": rng.integers(1, 500, rows),
+        "taker_buy_base_volume": rng.random(rows) * 2,
+        "taker_buy_quote_volume": rng.random(rows) * 70000,
+    }, columns=OHLC_COLUMNS)
+    return [document for batch in iter_documents(df) for document in batch]
+
+# Functions a Python client uses to get a DataFrame back from each format
+def decode_json(body):
+    return pd.DataFrame(json.loads(body))
+
+def decode_arrow(body):
+    return pa.ipc.open_stream(body).read_all().to_pandas()
+
+def decode_msgpack(body):
+    return pd.DataFrame(msgpack.unpackb(body))
+
+DECODERS = {JSON: decode_json, ARROW_STREAM: decode_arrow, MSGPACK: decode_msgpack}
+DECOMPRESSORS = {
+    None: lambda body: body,
+    "gzip": gzip.decompress,
+    "zstd": lambda body: zstandard.ZstdDecompressor().decompressobj().decompress(body),
+}
+
+# Function to time the best of repeat runs of func
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return result, min(timings)
+
+def main(rows, repeat):
+    candles = synthetic_candles(rows)
+    print(f"{rows} candles, best of {repeat} runs")
+    print(f"{'format':>38} {'encoding':>8} {'serialize':>10} {'wire size':>11} {'to DataFrame':>13}")
+
+    for media_type in (JSON, ARROW_STREAM, MSGPACK):
+        for encoding in (None, "gzip", "zstd"):
+            # Server side: what /data does for a page (encoding and compression)
+            (body, applied), serialize = best_of(lambda: compress(encode_page(candles, media_type), encoding), repeat)
+            # Client side: decompress and build a DataFrame
+            df, decode = best_of(lambda: DECODERS[media_type](DECOMPRESSORS[applied](body)), repeat)
+            assert len(df) == rows
+            print(f"{media_type:>38} {encoding or '-':>8} {serialize * 1000:8.1f}ms {len(body) / 1_000_000:9.2f}MB {decode * 1000:11.1f}ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the /data response formats: serialization time, wire size and decoding.")
+    parser.add_argument('--rows', type=int, help="Number of candles", default=100_000)
+    parser.add_argument('--repeat', type=int, help="Timed runs per format, the best one is reported", default=3)
+
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
@@ -0,0 +1,107 @@
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import app_path  # makes the shared modules in app/ importable
+from indicators import rsi, sma, ema, macd, bbands, atr, pct_change, lag
+
+# Largest difference to pandas_ta that still counts as equal, relative to the magnitude of the values.
+# The EWM recursions and rolling sums run in a different order than in pandas, so results differ in the last digits.
+RELATIVE_TOLERANCE = 1e-9
+
+# Function to build a random walk of candles around BTC prices
+def synthetic_candles(rows):
+    rng = np.random.default_rng(42)
+    close = 35000 + np.cumsum(rng.normal(0, 10, rows))
+    high = close + rng.random(rows) * 20
+    low = close - rng.random(rows) * 20
+    return high, low, close
+
+# Functions computing each indicator with the NumPy kernels, as {column: values}
+def native_indicators(high, low, close):
+    return {
+        "rsi_14": lambda: {"RSI": rsi(close, 14)[0]},
+        "sma_200": lambda: {"SMA": sma(close, 200)[0]},
+        "ema_50": lambda: {"EMA": ema(close, 50)[0]},
+        "macd": lambda: dict(zip(("MACD", "MACDh", "MACDs"), macd(close)[0])),
+        "bbands_20": lambda: dict(zip(("BBL", "BBM", "BBU"), bbands(close, length=20)[0][:3])),
+        "atr_14": lambda: {"ATR": atr(high, low, close, 14)[0]},
+        "price_change": lambda: {"Price_Change": pct_change(close)[0] * 100},
+        "lag_1": lambda: {"Lag_1": lag(close, 1)[0]},
+    }
+
+# The same with pandas_ta (and pandas for the plain features), the way preprocessing.py computed them before
+def pandas_ta_indicators(ta, high, low, close):
+    high, low, close = pd.Series(high), pd.Series(low), pd.Series(close)
+    return {
+        "rsi_14": lambda: {"RSI": ta.rsi(close, length=14)},
+        "sma_200": lambda: {"SMA": ta.sma(close, length=200)},
+        "ema_50": lambda: {"EMA": ta.ema(close, length=50)},
+        "macd": lambda: dict(zip(("MACD", "MACDh", "MACDs"), (column for _, column in ta.macd(close).items()))),
+        "bbands_20": lambda: dict(zip(("BBL", "BBM", "BBU"), (column for _, column in ta.bbands(close, length=20).items()))),
+        "atr_14": lambda: {"ATR": ta.atr(high, low, close, length=14)},
+        "price_change": lambda: {"Price_Change": close.pct_change() * 100},
+        "lag_1": lambda: {"Lag_1": close.shift(1)},
+    }
+
+# Function to time the best of repeat runs of func
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return result, min(timings)
+
+# Function to compare two columns: NaNs at the same positions and the largest difference relative to the values
+def relative_difference(native, reference):
+    reference = np.asarray(reference, dtype=np.float64)
+    if not np.array_equal(np.isnan(native), np.isnan(reference)):
+        return np.inf
+    scale = max(np.nanmax(np.abs(reference)), 1.0)
+    return np.nanmax(np.abs(native - reference)) / scale
+
+def main(sizes, repeat, timing_only=False):
+    try:
+        import pandas_ta as ta
+    except ImportError:
+        # Without the reference there is no parity check, which must not pass silently
+        if not timing_only:
+            raise SystemExit("pandas_ta is not installed (pip install pandas_ta==0.3.14b0), the parity check cannot run. "
+                             "Use --timing-only to only time the NumPy kernels.")
+        ta = None
+        print("pandas_ta is not installed, only the NumPy kernels are timed.")
+
+    mismatches = 0
+    for rows in sizes:
+        high, low, close = synthetic_candles(rows)
+        native = native_indicators(high, low, close)
+        reference = pandas_ta_indicators(ta, high, low, close) if ta else {}
+        print(f"\n{rows} candles, best of {repeat} runs")
+        print(f"{'indicator':>13} {'numpy':>10} {'candles/s':>10} {'pandas_ta':>10} {'candles/s':>10} {'max rel. diff':>14}")
+
+        for name, compute in native.items():
+            columns, native_time = best_of(compute, repeat)
+            line = f"{name:>13} {native_time * 1000:8.1f}ms {rows / native_time / 1e6:8.1f}M/s"
+            if name in reference:
+                reference_columns, reference_time = best_of(reference[name], repeat)
+                difference = max(relative_difference(columns[column], reference_columns[column]) for column in columns)
+                equal = difference <= RELATIVE_TOLERANCE
+                mismatches += not equal
+                line += f" {reference_time * 1000:8.1f}ms {rows / reference_time / 1e6:8.1f}M/s {difference:14.1e}{'' if equal else '  MISMATCH'}"
+            print(line)
+
+    return mismatches
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the NumPy indicator kernels against pandas_ta: throughput and numerical parity.")
+    parser.add_argument('--rows', type=int, nargs='+', help="Numbers of candles to benchmark", default=[1_000_000, 10_000_000])
+    parser.add_argument('--repeat', type=int, help="Timed runs per indicator, the best one is reported", default=3)
+    parser.add_argument('--timing-only', action='store_true', help="Only time the NumPy kernels if pandas_ta is not installed")
+
+    # Parse the arguments
+    args = parser.parse_args()
+
+    # A non-zero exit code marks indicators that differ from pandas_ta, or a missing pandas_ta without --timing-only
+    sys.exit(1 if main(args.rows, args.repeat, args.timing_only) else 0)
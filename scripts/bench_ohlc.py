@@ -0,0 +1,73 @@
+import io
+import time
+import argparse
+import requests
+import pandas as pd
+
+# Aggregation per column, the same rules /ohlc applies inside MongoDB
+RESAMPLE_RULES = {
+    "open": "first",
+    "high": "max",
+    "low": "min",
+    "close": "last",
+    "volume": "sum",
+    "quote_volume": "sum",
+    "count": "sum",
+    "taker_buy_base_volume": "sum",
+    "taker_buy_quote_volume": "sum",
+}
+
+# Pandas offset aliases of the intervals /ohlc accepts
+PANDAS_UNITS = {"m": "min", "h": "h", "d": "D", "w": "7D"}
+
+# Weekly bars start on Monday like on Binance, the first Monday after the epoch
+WEEK_ORIGIN = pd.Timestamp("1970-01-05")
+
+# Previous path: stream every 1m candle from /data and resample on the client
+def client_side(api_url, symbol, start_date, end_date, interval):
+    start = time.perf_counter()
+    response = requests.get(f"{api_url}/data", params={
+        "symbol": symbol, "start_date": start_date, "end_date": end_date, "stream": "true",
+    })
+    response.raise_for_status()
+    candles = pd.read_json(io.BytesIO(response.content), lines=True)
+
+    candles.index = pd.to_datetime(candles["open_time"], unit="ms")
+    rule = f"{interval[:-1]}{PANDAS_UNITS[interval[-1]]}"
+    bars = candles.resample(rule, origin=WEEK_ORIGIN if interval[-1] == "w" else "epoch").agg(RESAMPLE_RULES).dropna(subset=["open"])
+    return len(bars), len(response.content), time.perf_counter() - start, len(candles)
+
+# New path: let MongoDB build the bars, following X-Next-Cursor until the range is complete
+def server_side(api_url, symbol, start_date, end_date, interval):
+    start = time.perf_counter()
+    params = {"symbol": symbol, "start_date": start_date, "end_date": end_date, "interval": interval}
+    bars, size = 0, 0
+    while True:
+        response = requests.get(f"{api_url}/ohlc", params=params)
+        response.raise_for_status()
+        bars += len(response.json())
+        size += len(response.content)
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+    return bars, size, time.perf_counter() - start
+
+def main(api_url, symbol, start_date, end_date, intervals, repeat):
+    for interval in intervals:
+        client = min((client_side(api_url, symbol, start_date, end_date, interval) for _ in range(repeat)), key=lambda r: r[2])
+        server = min((server_side(api_url, symbol, start_date, end_date, interval) for _ in range(repeat)), key=lambda r: r[2])
+        print(f"{interval}: {client[3]} candles -> {server[0]} bars")
+        print(f"  /data + pandas: {client[1] / 1_000_000:8.2f} MB in {client[2]:.3f}s ({client[0]} bars)")
+        print(f"  /ohlc:          {server[1] / 1_000_000:8.2f} MB in {server[2]:.3f}s ({server[1] and client[1] / server[1]:.0f}x less data)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark /ohlc against downloading 1m candles and resampling them with pandas.")
+    parser.add_argument('symbol', type=str, help="The symbol (collection) to resample")
+    parser.add_argument('start_date', type=str, help="Start of the range (ISO 8601)")
+    parser.add_argument('end_date', type=str, help="End of the range (ISO 8601)")
+    parser.add_argument('--api-url', type=str, help="Base URL of the API", default="http://fastapi:8000")
+    parser.add_argument('--intervals', type=str, nargs='+', help="Target intervals", default=["15m", "1h", "1d"])
+    parser.add_argument('--repeat', type=int, help="Runs per path, the fastest one is reported", default=3)
+
+    args = parser.parse_args()
+    main(args.api_url, args.symbol, args.start_date, args.end_date, args.intervals, args.repeat)
@@ -0,0 +1,183 @@
+import os
+import time
+import hashlib
+import argparse
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+
+# Public kline archives: <base_url>/spot/<daily|monthly>/klines/<PAIR>/<interval>/<PAIR>-<interval>-<date>.zip
+# Each archive has a <name>.CHECKSUM next to it with "<sha256>  <name>".
+BINANCE_URL = "https://data.binance.vision/data"
+BINANCE_US_URL = "https://data.binance.us/public_data"
+
+# Status codes worth retrying, everything else (e.g. 404 for a day that is not published) is final
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Errors while reading the body of an archive, the next attempt resumes from the .part file
+BODY_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+
+class ChecksumMismatch(IOError):
+    pass
+
+
+# Function to build the archive file names for a date range, one per day or per month
+def archive_names(pair, interval, start, end, period="daily"):
+    names = []
+    current = start
+    while current <= end:
+        if period == "daily":
+            names.append(f"{pair}-{interval}-{current.strftime('%Y-%m-%d')}.zip")
+            current += timedelta(days=1)
+        else:
+            names.append(f"{pair}-{interval}-{current.strftime('%Y-%m')}.zip")
+            current = (current.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return names
+
+def archive_url(base_url, pair, interval, name, period="daily"):
+    return f"{base_url}/spot/{period}/klines/{pair}/{interval}/{name}"
+
+# Function to create a keep-alive session whose connection pool fits the number of workers
+def create_session(workers):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def sha256_file(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Function to GET a URL with exponential backoff. Returns None for 404.
+def _get(session, url, retries, backoff, headers=None, stream=False):
+    for attempt in range(retries + 1):
+        try:
+            response = session.get(url, headers=headers, stream=stream, timeout=30)
+            if response.status_code == 404:
+                return None
+            if response.status_code not in RETRY_STATUS:
+                if response.status_code != 416:
+                    response.raise_for_status()
+                return response
+            error = f"HTTP {response.status_code}"
+            response.close()
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = str(e)
+        if attempt < retries:
+            time.sleep(backoff * 2 ** attempt)
+    raise IOError(f"Giving up on {url} after {retries + 1} attempts: {error}")
+
+# Function to download an archive into part_file, continuing after the bytes that are already there.
+# Returns False if the archive is not published.
+def _download_part(session, url, part_file, retries, backoff):
+    offset = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else None
+
+    response = _get(session, url, retries, backoff, headers=headers, stream=True)
+    if response is None:
+        return False
+    if response.status_code == 416:
+        # Range not satisfiable: the part file is already complete
+        response.close()
+        return True
+    mode = 'ab' if offset and response.status_code == 206 else 'wb'
+    with response, open(part_file, mode) as f:
+        for block in response.iter_content(chunk_size=1 << 16):
+            f.write(block)
+    return True
+
+# Function to download one archive, resuming a previous partial download and verifying its checksum
+def download_archive(session, url, local_file, retries=5, backoff=1.0, require_checksum=True):
+    """
+    Returns "skipped" if the file is already there, "missing" if it is not published, "downloaded" otherwise.
+    Data is written to <local_file>.part and only renamed once the checksum matched,
+    so any file without .part suffix is complete and verified.
+    A connection lost in the middle of the body is retried from where it stopped, a checksum mismatch from scratch.
+    """
+    if os.path.exists(local_file):
+        return "skipped"
+
+    checksum_response = _get(session, f"{url}.CHECKSUM", retries, backoff)
+    expected = checksum_response.text.split()[0] if checksum_response is not None else None
+    if expected is None and require_checksum:
+        # No checksum: the archive itself is not published either (or we cannot verify it)
+        return "missing"
+
+    part_file = f"{local_file}.part"
+    for attempt in range(retries + 1):
+        try:
+            if not _download_part(session, url, part_file, retries, backoff):
+                return "missing"
+            if expected is not None and sha256_file(part_file) != expected:
+                os.remove(part_file)
+                raise ChecksumMismatch(f"Checksum mismatch for {url}")
+            os.replace(part_file, local_file)
+            return "downloaded"
+        except (ChecksumMismatch, *BODY_ERRORS) as e:
+            if attempt == retries:
+                raise
+            print(f"Attempt {attempt + 1} failed for {url}: {e}")
+            time.sleep(backoff * 2 ** attempt)
+
+def download_archives(pair, interval, start, end, dest, period="daily", base_url=BINANCE_URL,
+                      workers=8, retries=5, backoff=1.0, require_checksum=True):
+    """
+    Downloads all archives of pair/interval between start and end (datetimes) into dest with a bounded thread pool
+    sharing one keep-alive session. Returns a summary dict: lists of downloaded, skipped and missing files,
+    and {file: error} of failed ones.
+    """
+    os.makedirs(dest, exist_ok=True)
+    summary = {"downloaded": [], "skipped": [], "missing": [], "failed": {}}
+    session = create_session(workers)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(
+                download_archive, session, archive_url(base_url, pair, interval, name, period),
+                os.path.join(dest, name), retries, backoff, require_checksum,
+            ): name
+            for name in archive_names(pair, interval, start, end, period)
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                summary[future.result()].append(name)
+            except Exception as e:
+                summary["failed"][name] = str(e)
+                print(f"Failed to download {name}: {e}")
+
+    session.close()
+    print(
+        f"{pair} {interval}: {len(summary['downloaded'])} downloaded, {len(summary['skipped'])} already present, "
+        f"{len(summary['missing'])} not available, {len(summary['failed'])} failed."
+    )
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Script for downloading Binance public kline archives.")
+    parser.add_argument('pair', type=str, help="Trading pair, e.g. BTCUSDT")
+    parser.add_argument('interval', type=str, help="Kline interval, e.g. 1m or 12h")
+    parser.add_argument('start', type=str, help="First date (YYYY-MM-DD)")
+    parser.add_argument('end', type=str, help="Last date (YYYY-MM-DD)")
+    parser.add_argument('--dest', type=str, help="Target folder", default="/data/Historical_data_Binance")
+    parser.add_argument('--period', type=str, choices=["daily", "monthly"], help="Daily or monthly archives", default="daily")
+    parser.add_argument('--base-url', type=str, help="Archive server", default=BINANCE_URL)
+    parser.add_argument('--workers', type=int, help="Parallel downloads", default=8)
+    parser.add_argument('--retries', type=int, help="Retries per request", default=5)
+    parser.add_argument('--no-checksum', action='store_true', help="Accept archives without .CHECKSUM file")
+
+    # Parse the arguments
+    args = parser.parse_args()
+
+    summary = download_archives(
+        args.pair, args.interval, datetime.fromisoformat(args.start), datetime.fromisoformat(args.end), args.dest,
+        args.period, args.base_url, args.workers, args.retries, require_checksum=not args.no_checksum,
+    )
+    if summary["failed"]:
+        raise SystemExit(1)
@@ -1,14 +1,16 @@
 import os
-import requests
+from binance_download import download_archives, BINANCE_US_URL
 import zipfile
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
 from sklearn.ensemble import RandomForestClassifier
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 from pymongo import MongoClient
+from kline_cache import cached_frame
+from indicators import rsi, sma
 
 # MongoDB Connection Setup
 client = MongoClient('mongodb://mongodb:27017/')  
@@ -17,9 +19,8 @@ collection = db['btc_usdt_12h']
 
 # Check if data exists in MongoDB
 if collection.count_documents({}) > 0:
-    # Retrieve data from MongoDB
-    stored_data = list(collection.find())
-    btc_usdt_data = pd.DataFrame(stored_data)
+    # Retrieve data from MongoDB through the local Arrow cache
+    btc_usdt_data = cached_frame(collection)
     
     # Convert the necessary columns back to their appropriate data types
     btc_usdt_data['open_time'] = pd.to_datetime(btc_usdt_data['open_time'])
@@ -38,31 +39,8 @@ else:
     # Define the trading pair you want to download (BTC-USDT)
     pair = 'BTCUSDT'
 
-    # Loop through each day from start_date to end_date
-    current_date = start_date
-    while current_date < end_date:
-        # Format the date
-        date_str = current_date.strftime('%Y-%m-%d')
-        
-        # Construct the file URL
-        file_url = f"https://data.binance.us/public_data/spot/daily/klines/{pair}/12h/{pair}-12h-{date_str}.zip"
-        
-        # Define the local file name
-        local_file = f"binance_data/{pair}-12h-{date_str}.zip"
-        
-        # Download the file
-        print(f"Downloading {file_url}")
-        response = requests.get(file_url)
-        
-        # Save the file if the download is successful
-        if response.status_code == 200:
-            with open(local_file, 'wb') as f:
-                f.write(response.content)
-        else:
-            print(f"Failed to download {file_url}")
-        
-        # Move to the next day
-        current_date += timedelta(days=1)
+    # Download all days concurrently (keep-alive, retries, checksum check, already downloaded days are skipped)
+    download_archives(pair, '12h', start_date, end_date, 'binance_data', base_url=BINANCE_US_URL)
 
     # Step 2: Extract and Combine the Data
     
@@ -110,9 +88,10 @@ btc_usdt_data = btc_usdt_data[btc_usdt_data['close'] > 10000]
 btc_usdt_data.reset_index(drop=True, inplace=True)
 
 # Recalculate technical indicators: RSI, SMA_50, SMA_200
-btc_usdt_data['RSI'] = ta.rsi(btc_usdt_data['close'], length=14)
-btc_usdt_data['SMA_50'] = ta.sma(btc_usdt_data['close'], length=50)
-btc_usdt_data['SMA_200'] = ta.sma(btc_usdt_data['close'], length=200)
+close = btc_usdt_data['close'].to_numpy(dtype=np.float64)
+btc_usdt_data['RSI'], _ = rsi(close, length=14)
+btc_usdt_data['SMA_50'], _ = sma(close, length=50)
+btc_usdt_data['SMA_200'], _ = sma(close, length=200)
 
 # Drop rows with missing values in SMA_50, SMA_200, or RSI
 btc_usdt_data.dropna(subset=['SMA_50', 'SMA_200', 'RSI'], inplace=True)
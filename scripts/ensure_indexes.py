@@ -0,0 +1,41 @@
+import asyncio
+import argparse
+from motor.motor_asyncio import AsyncIOMotorClient
+import app_path  # makes the shared modules in app/ importable
+from indexes import ensure_indexes, ensure_collection_indexes, index_plan
+
+MONGO_URL = "mongodb://mongodb:27017/"
+
+# Function to print the planned and existing indexes of a collection without changing anything
+async def show_indexes(db, name):
+    plan = await index_plan(db, name)
+    existing = await db[name].index_information()
+    print(f"{name}:")
+    for index_name, index in existing.items():
+        print(f"  existing {index_name}: {index['key']}{' unique' if index.get('unique') else ''}")
+    for keys, unique in plan:
+        print(f"  planned  {keys}{' unique' if unique else ''}")
+
+async def main(collections, dry_run=False):
+    db = AsyncIOMotorClient(MONGO_URL)['OPA_Data']
+    names = collections or sorted(await db.list_collection_names())
+    if dry_run:
+        for name in names:
+            await show_indexes(db, name)
+        return
+    if collections:
+        for name in names:
+            print(f"{name}: created {await ensure_collection_indexes(db, name)}")
+    else:
+        report = await ensure_indexes(db)
+        print(f"Checked {len(names)} collections, created indexes on {len(report)}.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Script for creating the open_time indexes of the OHLC and preprocessed collections.")
+    parser.add_argument('collections', type=str, nargs='*', help="The collections to check (default: all)")
+    parser.add_argument('--dry-run', action='store_true', help="Only show existing and planned indexes")
+
+    # Parse the arguments
+    args = parser.parse_args()
+
+    asyncio.run(main(args.collections, args.dry_run))
@@ -0,0 +1,148 @@
+import os
+import json
+import shutil
+import hashlib
+import inspect
+import argparse
+from datetime import datetime
+import pandas as pd
+import app_path  # makes the shared modules in app/ importable
+from storage import ms_to_datetime, TIME_FIELD
+from kline_cache import iter_partitions, _month, _write_month
+
+# Materialized feature sets: <DATA_DIR>/feature_store/<symbol>/<definition hash>/<YYYY-MM>.arrow plus manifest.json.
+# A feature set is keyed by symbol and the hash of its definition (see FEATURES in preprocessing.py, which covers the code
+# computing the features), so changing the features starts a new set next to the old ones instead of overwriting them,
+# and unchanged sets are only extended.
+# Partitions are uncompressed Arrow IPC files like the kline cache, readers map only the columns and months they need.
+STORE_DIR = os.path.join(os.getenv("DATA_DIR", "/data"), "feature_store")
+
+MANIFEST = "manifest.json"
+
+
+def feature_hash(definition):
+    """
+    Short, stable hash of a feature definition (a JSON serializable dict)
+    """
+    encoded = json.dumps(definition, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+def source_hash(*objects):
+    """
+    Short hash of the source code of functions, classes or modules, changes with every edit of them
+    """
+    digest = hashlib.sha256()
+    for obj in objects:
+        digest.update(inspect.getsource(obj).encode())
+    return digest.hexdigest()[:16]
+
+def _set_dir(symbol, definition_hash, root):
+    return os.path.join(root, symbol, definition_hash)
+
+def read_manifest(symbol, definition_hash, root=STORE_DIR):
+    """
+    Returns the manifest of a feature set (definition, time range, rows in total and per month, columns), None if it does not exist
+    """
+    path = os.path.join(_set_dir(symbol, definition_hash, root), MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def _write_manifest(directory, manifest):
+    temp_path = os.path.join(directory, f"{MANIFEST}.tmp")
+    with open(temp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, os.path.join(directory, MANIFEST))
+
+def last_feature_time(symbol, definition_hash, root=STORE_DIR):
+    """
+    Returns the open_time (milliseconds) of the newest row of a feature set, None if it has none
+    """
+    manifest = read_manifest(symbol, definition_hash, root)
+    return manifest["end_ms"] if manifest else None
+
+def write_features(symbol, definition, df, root=STORE_DIR):
+    """
+    Merges the rows of df (with open_time as datetime or milliseconds) into the feature set of symbol and definition,
+    month by month. Rows with an open_time that is already stored replace the stored ones.
+    """
+    if df.empty:
+        return
+    definition_hash = feature_hash(definition)
+    directory = _set_dir(symbol, definition_hash, root)
+    os.makedirs(directory, exist_ok=True)
+
+    df = df.drop(columns="_id", errors="ignore").copy()
+    if pd.api.types.is_datetime64_any_dtype(df[TIME_FIELD]):
+        df[TIME_FIELD] = df[TIME_FIELD].astype("datetime64[ms]").astype("int64")
+    manifest = read_manifest(symbol, definition_hash, root) or {
+        "symbol": symbol,
+        "definition_hash": definition_hash,
+        "definition": definition,
+        "start_ms": int(df[TIME_FIELD].min()),
+        "end_ms": int(df[TIME_FIELD].max()),
+        "rows": 0,
+        "months": {},
+    }
+    # Rows per month partition, only the partitions written now are counted again
+    rows_per_month = manifest["months"]
+    for month, rows in df.groupby(df[TIME_FIELD].map(_month), sort=True):
+        rows_per_month[month] = _write_month(directory, month, rows)
+
+    manifest["start_ms"] = min(manifest["start_ms"], int(df[TIME_FIELD].min()))
+    manifest["end_ms"] = max(manifest["end_ms"], int(df[TIME_FIELD].max()))
+    manifest["rows"] = sum(rows_per_month.values())
+    manifest["columns"] = sorted(set(manifest.get("columns", [])) | set(df.columns))
+    manifest["updated"] = datetime.now().isoformat(timespec="seconds")
+    _write_manifest(directory, manifest)
+
+def drop_features(symbol, definition_hash, root=STORE_DIR):
+    """
+    Removes a feature set, e.g. before recomputing it from scratch
+    """
+    shutil.rmtree(_set_dir(symbol, definition_hash, root), ignore_errors=True)
+
+def load_features(symbol, definition_hash, columns=None, start_ms=None, end_ms=None, root=STORE_DIR):
+    """
+    Loads the rows of a feature set with open_time (milliseconds) in [start_ms, end_ms].
+    Only the month partitions overlapping the range and the given columns (plus open_time) are read.
+    """
+    read_columns = None if columns is None else list(dict.fromkeys([TIME_FIELD, *columns]))
+    frames = list(iter_partitions(_set_dir(symbol, definition_hash, root), start_ms, end_ms, read_columns))
+    if not frames:
+        return pd.DataFrame(columns=read_columns)
+    return pd.concat(frames, ignore_index=True)
+
+def list_feature_sets(symbols=None, root=STORE_DIR):
+    """
+    Returns the manifests of all feature sets (of the given symbols), newest update first per symbol
+    """
+    manifests = []
+    for symbol in sorted(symbols or (os.listdir(root) if os.path.isdir(root) else [])):
+        symbol_dir = os.path.join(root, symbol)
+        if not os.path.isdir(symbol_dir):
+            continue
+        sets = [read_manifest(symbol, definition_hash, root) for definition_hash in os.listdir(symbol_dir)]
+        manifests.extend(sorted((manifest for manifest in sets if manifest), key=lambda manifest: manifest["updated"], reverse=True))
+    return manifests
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Script for listing and dropping the materialized feature sets.")
+    parser.add_argument('symbols', type=str, nargs='*', help="The symbols to list (default: all)")
+    parser.add_argument('--drop', type=str, metavar="HASH", help="Drop the feature set with this definition hash of the given symbols")
+
+    # Parse the arguments
+    args = parser.parse_args()
+
+    if args.drop:
+        for symbol in args.symbols:
+            drop_features(symbol, args.drop)
+            print(f"Dropped feature set {args.drop} of {symbol}.")
+
+    for manifest in list_feature_sets(args.symbols):
+        print(
+            f"{manifest['symbol']:>12} {manifest['definition_hash']}: "
+            f"{manifest['rows']} rows from {ms_to_datetime(manifest['start_ms'])} to {ms_to_datetime(manifest['end_ms'])}, "
+            f"updated {manifest['updated']}"
+        )
@@ -0,0 +1,209 @@
+import os
+import time
+import zipfile
+import app_path  # makes the shared modules in app/ importable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pymongo import MongoClient, UpdateOne, ASCENDING
+from pymongo.errors import OperationFailure
+from manifest import archive_fingerprint
+from columnar import read_ohlc_csv, iter_documents, BATCH_SIZE
+from storage import use_timeseries, is_timeseries, to_storage_frame, ms_to_datetime, TIMESERIES_OPTIONS, META_FIELD
+
+MONGO_URL = "mongodb://mongodb:27017/"
+
+# Fields that identify a candle. Collections tagged with 'key' (read_to_db_neha.py) are keyed per symbol.
+SYMBOL_KEY_FIELDS = ("key", "open_time")
+TIME_KEY_FIELDS = ("open_time",)
+
+# Number of CSV rows parsed and written per batch. Keeps memory bounded independent of the archive size.
+CHUNK_SIZE = 50_000
+
+# Layout of every collection seen by this process, see app/storage.py
+_layouts = {}
+
+# Function to check whether a collection is (or, with OHLC_STORAGE=timeseries, will be) a time-series collection
+def collection_is_timeseries(collection):
+    if collection.name not in _layouts:
+        info = next(collection.database.list_collections(filter={"name": collection.name}), None)
+        if info is None:
+            return use_timeseries()
+        _layouts[collection.name] = is_timeseries(info)
+    return _layouts[collection.name]
+
+# Function to create the unique index the upserts are keyed on
+def ensure_unique_index(collection, key_fields):
+    try:
+        collection.create_index([(field, ASCENDING) for field in key_fields], unique=True)
+    except OperationFailure as e:
+        print(f"Could not create unique index {key_fields} on {collection.name}, it probably contains duplicates already: {e}")
+        raise
+
+# Function to get a collection ready for ingestion in the configured storage layout
+def prepare_collection(collection, key_fields):
+    if not collection_is_timeseries(collection):
+        ensure_unique_index(collection, key_fields)
+        return
+    # Time-series collections cannot have unique indexes, the manifest keeps re-runs from duplicating archives
+    if collection.name not in _layouts:
+        collection.database.create_collection(collection.name, timeseries=TIMESERIES_OPTIONS)
+        _layouts[collection.name] = True
+
+# Function to write records idempotently: re-ingesting the same candles updates them instead of adding copies
+def upsert_records(collection, records, key_fields):
+    if not records:
+        return 0
+    operations = [
+        UpdateOne({field: record[field] for field in key_fields}, {"$set": record}, upsert=True)
+        for record in records
+    ]
+    result = collection.bulk_write(operations, ordered=False)
+    return result.upserted_count + result.matched_count
+
+# Function to write a DataFrame of candles batch by batch in the layout of the collection
+def write_frame(collection, df, key_fields, extra=None):
+    if collection_is_timeseries(collection):
+        extra = {META_FIELD: collection.name, **(extra or {})}
+        for batch in iter_documents(to_storage_frame(df, True), BATCH_SIZE, extra):
+            collection.insert_many(batch, ordered=False)
+        return
+    for batch in iter_documents(df, BATCH_SIZE, extra):
+        upsert_records(collection, batch, key_fields)
+
+# Function to remove the candles a failed attempt wrote to a time-series collection, which has no key to upsert on
+def delete_written(collection, written):
+    if not collection_is_timeseries(collection):
+        return
+    for meta, (low, high) in written.items():
+        collection.delete_many({
+            META_FIELD: meta, "open_time": {"$gte": ms_to_datetime(low), "$lte": ms_to_datetime(high)},
+        })
+
+# Function to read the CSV members of a ZIP archive in chunks, without extracting anything to disk
+def iter_zip_chunks(zip_path, chunksize=CHUNK_SIZE):
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        for member in zip_ref.infolist():
+            if not member.filename.endswith(".csv"):
+                print(f"Skipping unsupported file: {member.filename}")
+                continue
+
+            with zip_ref.open(member) as csv_file:
+                for chunk in read_ohlc_csv(csv_file, chunksize=chunksize):
+                    yield member.filename, chunk
+
+# Function to stream one ZIP archive into MongoDB chunk by chunk
+def ingest_zip(zip_path, collection, tag_key=False, chunksize=CHUNK_SIZE, written=None):
+    """
+    Reads every CSV inside zip_path directly from the archive and upserts it with one unordered bulk_write per chunk.
+    The collection has to be set up with prepare_collection(). Re-running an archive is safe for regular collections
+    only: time-series collections are plain inserts, so the rows of an earlier attempt have to be removed first.
+    If written is a dict, the open_time range about to be written is recorded in it per meta field value before
+    every chunk, for delete_written() to clean up after a failure.
+    If tag_key is set, the first 7 chars of the CSV name (e.g. BTCUSDC) are stored as 'key' on every document,
+    same as read_to_db_neha.py does for extracted files.
+    Returns a dict with the rows written, their open_time range, the archive size and the elapsed time.
+    """
+    print(f"Streaming {zip_path}...")
+    archive_bytes = os.path.getsize(zip_path)
+    rows = 0
+    open_time_min, open_time_max = None, None
+    start = time.perf_counter()
+
+    key_fields = SYMBOL_KEY_FIELDS if tag_key else TIME_KEY_FIELDS
+    for member, chunk in iter_zip_chunks(zip_path, chunksize):
+        extra = {'key': os.path.basename(member)[:7]} if tag_key else None
+        if written is not None:
+            meta = (extra or {}).get(META_FIELD, collection.name)
+            written[meta] = merge_range(*written.get(meta, (None, None)), chunk['open_time'])
+        write_frame(collection, chunk, key_fields, extra)
+        rows += len(chunk)
+        open_time_min, open_time_max = merge_range(open_time_min, open_time_max, chunk['open_time'])
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "path": zip_path, "rows": rows, "bytes": archive_bytes, "seconds": elapsed,
+        "open_time_min": open_time_min, "open_time_max": open_time_max,
+    }
+    print_stats(stats)
+    return stats
+
+# Function to widen an open_time range by the values of a column
+def merge_range(current_min, current_max, open_times):
+    if open_times.empty:
+        return current_min, current_max
+    low, high = int(open_times.min()), int(open_times.max())
+    if current_min is not None:
+        low, high = min(low, current_min), max(high, current_max)
+    return low, high
+
+# Function to report throughput of a single archive
+def print_stats(stats):
+    elapsed = max(stats["seconds"], 1e-9)
+    print(
+        f"Inserted {stats['rows']} records from {stats['path']} in {stats['seconds']:.2f}s "
+        f"({stats['rows'] / elapsed:,.0f} rows/s, {stats['bytes'] / elapsed / 1_000_000:.2f} MB/s)"
+    )
+
+# MongoDB collection of the current worker process, set up once by the pool initializer
+_worker_collection = None
+
+def _init_worker(collection_name, max_pool_size):
+    global _worker_collection
+    client = MongoClient(MONGO_URL, maxPoolSize=max_pool_size)
+    _worker_collection = client['OPA_Data'][collection_name]
+
+# Runs inside a worker process. A failing archive is retried on its own, other archives are not affected.
+# Before a retry, the candles of the failed attempt are deleted from time-series collections so they are not inserted twice.
+def _ingest_worker(zip_path, tag_key, chunksize, retries):
+    written = {}
+    for attempt in range(1, retries + 2):
+        try:
+            delete_written(_worker_collection, written)
+            written.clear()
+            stats = ingest_zip(zip_path, _worker_collection, tag_key=tag_key, chunksize=chunksize, written=written)
+            stats["fingerprint"] = archive_fingerprint(zip_path)
+            return stats
+        except Exception as e:
+            print(f"Attempt {attempt} failed for {zip_path}: {e}")
+            if attempt > retries:
+                raise
+            time.sleep(2 ** (attempt - 1))
+
+# Function to ingest many ZIP archives in parallel
+def ingest_parallel(zip_paths, collection_name, workers=None, tag_key=False, chunksize=CHUNK_SIZE, retries=2, on_loaded=None):
+    """
+    Fans the archives out to a process pool. CSV parsing and type conversion happen in the workers,
+    each of which holds its own pooled MongoClient. on_loaded(stats) is called in this process for every
+    finished archive (e.g. to record it in the manifest).
+    Returns (stats of loaded archives, {path: error} of failed ones).
+    """
+    workers = workers or os.cpu_count() or 1
+    results, failures = [], {}
+    with MongoClient(MONGO_URL) as client:
+        prepare_collection(client['OPA_Data'][collection_name], SYMBOL_KEY_FIELDS if tag_key else TIME_KEY_FIELDS)
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(collection_name, 4)) as pool:
+        futures = {
+            pool.submit(_ingest_worker, zip_path, tag_key, chunksize, retries): zip_path
+            for zip_path in zip_paths
+        }
+        for future in as_completed(futures):
+            zip_path = futures[future]
+            try:
+                stats = future.result()
+            except Exception as e:
+                failures[zip_path] = str(e)
+                continue
+            results.append(stats)
+            if on_loaded is not None:
+                on_loaded(stats)
+
+    elapsed = time.perf_counter() - start
+    total_rows = sum(stats["rows"] for stats in results)
+    print(
+        f"Loaded {len(results)} archives ({total_rows} rows) with {workers} workers in {elapsed:.2f}s "
+        f"({total_rows / max(elapsed, 1e-9):,.0f} rows/s)"
+    )
+    for zip_path, error in failures.items():
+        print(f"Failed to load {zip_path}: {error}")
+    return results, failures
@@ -0,0 +1,156 @@
+import os
+import glob
+import time
+import shutil
+import argparse
+from datetime import datetime, timezone
+import pandas as pd
+import pyarrow as pa
+from pymongo import MongoClient
+import app_path  # makes the shared modules in app/ importable
+from storage import from_storage, ms_to_datetime, TIME_FIELD
+
+# Columnar copy of the candle collections: <DATA_DIR>/kline_cache/<db>/<collection>/<YYYY-MM>.arrow
+# Files are uncompressed Arrow IPC, so loading them is a memory map instead of a parse.
+CACHE_DIR = os.path.join(os.getenv("DATA_DIR", "/data"), "kline_cache")
+
+# Documents fetched from MongoDB per round trip while refreshing
+FETCH_BATCH_SIZE = 50_000
+
+
+def _cache_dir(collection, root):
+    return os.path.join(root, collection.database.name, collection.name)
+
+def _month(open_time_ms):
+    return datetime.fromtimestamp(open_time_ms / 1000, tz=timezone.utc).strftime("%Y-%m")
+
+def _month_files(directory):
+    return sorted(glob.glob(os.path.join(directory, "*.arrow")))
+
+# Function to memory-map one month partition
+def _read_month(path, columns=None):
+    with pa.memory_map(path, 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select([column for column in columns if column in table.column_names])
+    return table.to_pandas()
+
+# Function to merge new candles into a month partition. Written to a temp file first, so readers never see half a file.
+# Returns the number of rows in the partition.
+def _write_month(directory, month, documents):
+    path = os.path.join(directory, f"{month}.arrow")
+    df = pd.DataFrame(documents)
+    if os.path.exists(path):
+        df = pd.concat([_read_month(path), df], ignore_index=True)
+    df = df.drop_duplicates(subset=TIME_FIELD, keep='last').sort_values(TIME_FIELD, ignore_index=True)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    temp_path = f"{path}.tmp"
+    with pa.OSFile(temp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(temp_path, path)
+    return len(df)
+
+# Function to get the newest cached open_time (in milliseconds) of a collection
+def _max_open_time(directory):
+    files = _month_files(directory)
+    if not files:
+        return None
+    open_times = _read_month(files[-1], [TIME_FIELD])[TIME_FIELD]
+    return int(open_times.max()) if not open_times.empty else None
+
+def refresh_cache(collection, root=CACHE_DIR):
+    """
+    Appends every candle newer than the newest cached open_time to the cache, month by month.
+    Only the last month partition gets rewritten on a daily top-up. Returns the number of new candles.
+    """
+    directory = _cache_dir(collection, root)
+    os.makedirs(directory, exist_ok=True)
+    last = _max_open_time(directory)
+
+    query = {}
+    if last is not None:
+        # open_time is a date in time-series and preprocessed collections, milliseconds otherwise
+        sample = collection.find_one({}, {TIME_FIELD: 1})
+        stored_as_date = sample is not None and isinstance(sample.get(TIME_FIELD), datetime)
+        query = {TIME_FIELD: {"$gt": ms_to_datetime(last) if stored_as_date else last}}
+
+    cursor = collection.find(query, {"_id": 0}, allow_disk_use=True).sort(TIME_FIELD, 1).batch_size(FETCH_BATCH_SIZE)
+    added, month, documents = 0, None, []
+    for document in cursor:
+        document = from_storage(document)
+        document_month = _month(document[TIME_FIELD])
+        if document_month != month and documents:
+            _write_month(directory, month, documents)
+            documents = []
+        month = document_month
+        documents.append(document)
+        added += 1
+    if documents:
+        _write_month(directory, month, documents)
+    return added
+
+def iter_partitions(directory, start_ms=None, end_ms=None, columns=None):
+    """
+    Yields the rows of the month partitions in directory with open_time (milliseconds) in [start_ms, end_ms],
+    month by month in time order. columns limits the loaded columns.
+    """
+    first_month = _month(start_ms) if start_ms is not None else None
+    last_month = _month(end_ms) if end_ms is not None else None
+    read_columns = None if columns is None else list(dict.fromkeys([TIME_FIELD, *columns]))
+
+    for path in _month_files(directory):
+        month = os.path.basename(path)[:-len(".arrow")]
+        if (first_month and month < first_month) or (last_month and month > last_month):
+            continue
+        df = _read_month(path, read_columns)
+        if start_ms is not None:
+            df = df[df[TIME_FIELD] >= start_ms]
+        if end_ms is not None:
+            df = df[df[TIME_FIELD] <= end_ms]
+        if columns is not None and TIME_FIELD not in columns:
+            df = df.drop(columns=TIME_FIELD)
+        if not df.empty:
+            yield df.reset_index(drop=True)
+
+def iter_cache(collection, start_ms=None, end_ms=None, columns=None, root=CACHE_DIR):
+    """
+    Yields the cached candles of a collection with open_time (milliseconds) in [start_ms, end_ms] month by month,
+    in time order, so only one month partition is in memory at a time. columns limits the loaded columns.
+    """
+    yield from iter_partitions(_cache_dir(collection, root), start_ms, end_ms, columns)
+
+def load_cache(collection, start_ms=None, end_ms=None, columns=None, root=CACHE_DIR):
+    """
+    Loads the cached candles of a collection with open_time (milliseconds) in [start_ms, end_ms].
+    Only the month partitions overlapping the range are mapped. columns limits the loaded columns.
+    """
+    frames = list(iter_cache(collection, start_ms, end_ms, columns, root))
+    if not frames:
+        return pd.DataFrame(columns=None if columns is None else list(dict.fromkeys([TIME_FIELD, *columns])))
+    return pd.concat(frames, ignore_index=True)
+
+def cached_frame(collection, start_ms=None, end_ms=None, columns=None, root=CACHE_DIR):
+    """
+    Brings the cache of a collection up to date and loads it, this replaces pd.DataFrame(list(collection.find())).
+    """
+    start = time.perf_counter()
+    added = refresh_cache(collection, root)
+    df = load_cache(collection, start_ms, end_ms, columns, root)
+    print(f"Loaded {len(df)} rows of {collection.name} from the cache ({added} new) in {time.perf_counter() - start:.2f}s.")
+    return df
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Script for refreshing the local Arrow cache of candle collections.")
+    parser.add_argument('collections', type=str, nargs='+', help="The collections (symbols) to cache")
+    parser.add_argument('--rebuild', action='store_true', help="Drop the cache first, e.g. after backfilling older candles")
+
+    # Parse the arguments
+    args = parser.parse_args()
+
+    db = MongoClient("mongodb://mongodb:27017/")['OPA_Data']
+    for name in args.collections:
+        if args.rebuild:
+            shutil.rmtree(_cache_dir(db[name], CACHE_DIR), ignore_errors=True)
+        print(f"{name}: {refresh_cache(db[name])} new candles cached.")
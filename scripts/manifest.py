@@ -0,0 +1,78 @@
+import os
+import hashlib
+from datetime import datetime
+from pymongo import ASCENDING
+
+# Collection that remembers which archives were already loaded into which collection
+MANIFEST_COLLECTION = "ingest_manifest"
+
+# Function to get the manifest collection next to the data collection
+def get_manifest(db):
+    manifest = db[MANIFEST_COLLECTION]
+    manifest.create_index([("collection", ASCENDING), ("path", ASCENDING)], unique=True)
+    return manifest
+
+# Function to hash an archive without loading it into memory at once
+def sha256_file(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Function to collect size, mtime and SHA-256 of an archive
+def archive_fingerprint(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": sha256_file(path)}
+
+# Function to filter out the archives that are already loaded and did not change since
+def pending_archives(manifest, collection_name, zip_paths, force=False):
+    """
+    Loads the manifest of collection_name with a single query and compares it against os.stat() of every archive.
+    Unchanged archives (same size and mtime) are skipped without opening them. Only when the stat differs the
+    SHA-256 is computed, so a touched but otherwise identical archive is skipped as well.
+    """
+    if force:
+        return list(zip_paths)
+
+    known = {entry["path"]: entry for entry in manifest.find({"collection": collection_name})}
+    pending = []
+
+    for zip_path in zip_paths:
+        entry = known.get(zip_path)
+        if entry is None:
+            pending.append(zip_path)
+            continue
+
+        stat = os.stat(zip_path)
+        if stat.st_size == entry["size"] and stat.st_mtime == entry["mtime"]:
+            continue
+
+        if stat.st_size == entry["size"] and sha256_file(zip_path) == entry["sha256"]:
+            # Content is the same, only remember the new mtime
+            manifest.update_one({"_id": entry["_id"]}, {"$set": {"mtime": stat.st_mtime}})
+            continue
+
+        pending.append(zip_path)
+
+    print(f"{len(zip_paths) - len(pending)} of {len(zip_paths)} archives already loaded into {collection_name}, skipping them.")
+    return pending
+
+# Function to remember a loaded archive
+def record_archive(manifest, collection_name, stats, fingerprint=None):
+    """
+    Stores path, size, mtime, SHA-256, row count and open_time range of an archive.
+    stats is the dict returned by ingestion.ingest_zip().
+    """
+    fingerprint = fingerprint or archive_fingerprint(stats["path"])
+    manifest.update_one(
+        {"collection": collection_name, "path": stats["path"]},
+        {"$set": {
+            **fingerprint,
+            "rows": stats["rows"],
+            "open_time_min": stats.get("open_time_min"),
+            "open_time_max": stats.get("open_time_max"),
+            "loaded_at": datetime.utcnow(),
+        }},
+        upsert=True,
+    )
@@ -0,0 +1,85 @@
+import sys
+import time
+import argparse
+from pymongo import MongoClient
+import app_path  # makes the shared modules in app/ importable
+from storage import is_timeseries, TIMESERIES_OPTIONS, TIME_FIELD, META_FIELD
+
+# MongoDB connection settings
+def get_mongo_connection():
+    try:
+        client = MongoClient("mongodb://mongodb:27017/")
+        return client['OPA_Data']
+    except Exception as e:
+        print(f"Error connecting to MongoDB: {e}")
+        sys.exit(1)
+
+# Function to list the plain OHLC collections (everything that has candles and is not derived data)
+def ohlc_collections(db):
+    names = []
+    for info in db.list_collections():
+        name = info["name"]
+        if is_timeseries(info) or name.startswith("preprocessed_") or name.endswith("_backup") or name == "ingest_manifest":
+            continue
+        if db[name].find_one({TIME_FIELD: {"$type": "number"}}, {"_id": 1}) is not None:
+            names.append(name)
+    return names
+
+# Function to move one collection into a time-series collection of the same name
+def migrate(db, name, drop_backup=False):
+    """
+    Renames the plain collection to <name>_backup and rebuilds <name> as time-series collection from it
+    inside MongoDB ($out with timeseries options, MongoDB 7.0+). open_time is converted from milliseconds to a date,
+    candles without 'key' get the collection name as symbol. Time-series collections cannot be renamed,
+    which is why the plain collection is moved out of the way first.
+    """
+    infos = list(db.list_collections(filter={"name": name}))
+    if not infos:
+        print(f"Collection {name} does not exist, skipping.")
+        return
+    if is_timeseries(infos[0]):
+        print(f"Collection {name} is already a time-series collection, skipping.")
+        return
+
+    backup = f"{name}_backup"
+    start = time.perf_counter()
+    db[name].rename(backup)
+    db[backup].aggregate([
+        {"$match": {TIME_FIELD: {"$type": "number"}}},
+        {"$set": {
+            TIME_FIELD: {"$toDate": f"${TIME_FIELD}"},
+            META_FIELD: {"$ifNull": [f"${META_FIELD}", name]},
+        }},
+        {"$unset": "_id"},
+        {"$out": {"db": db.name, "coll": name, "timeseries": TIMESERIES_OPTIONS}},
+    ], allowDiskUse=True)
+
+    count = db[name].count_documents({})
+    print(f"Migrated {count} candles of {name} to a time-series collection in {time.perf_counter() - start:.1f}s.")
+    print(f"  storage: {db.command('collStats', backup)['storageSize']:,} bytes before, "
+          f"{db.command('collStats', name)['storageSize']:,} bytes after")
+
+    if drop_backup:
+        db[backup].drop()
+    else:
+        print(f"  the original data is kept in {backup}")
+
+def main(symbols, all_collections=False, drop_backup=False):
+    db = get_mongo_connection()
+    if all_collections:
+        symbols = ohlc_collections(db)
+    for symbol in symbols:
+        migrate(db, symbol, drop_backup)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Script for migrating OHLC collections to MongoDB time-series collections.")
+    parser.add_argument('symbols', type=str, nargs='*', help="The symbols (collections) to migrate")
+    parser.add_argument('--all', action='store_true', help="Migrate every plain OHLC collection")
+    parser.add_argument('--drop-backup', action='store_true', help="Drop the original collection after the migration")
+
+    # Parse the arguments
+    args = parser.parse_args()
+    if not args.symbols and not args.all:
+        parser.error("Pass at least one symbol or --all")
+
+    main(args.symbols, args.all, args.drop_backup)
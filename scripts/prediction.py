@@ -1,3 +1,5 @@
+import os
+import json
 import time
 from datetime import datetime
 import joblib
@@ -7,10 +9,21 @@ import requests
 from pymongo import MongoClient
 import sys
 
+from preprocessing import FEATURE_HASH
+from training import FEATURE_COLUMNS, MODEL_FEATURES_PATH
+
 # Load the trained model
 model = joblib.load('random_forest_model.pkl')
 print("Model loaded successfully.")
 
+# Check that the model was trained on the features computed here (training.py saves its feature set next to the model)
+if os.path.exists(MODEL_FEATURES_PATH):
+    with open(MODEL_FEATURES_PATH) as f:
+        model_features = json.load(f)
+    print(f"Model trained on feature set {model_features['definition_hash']} of {model_features['collection']}.")
+    if model_features['definition_hash'] != FEATURE_HASH or model_features['columns'] != FEATURE_COLUMNS:
+        print(f"Warning: the current feature set is {FEATURE_HASH} with {FEATURE_COLUMNS}, retrain the model with training.py.")
+
 # Initialize storage for actual prices and predictions
 actual_prices = []
 predicted_trends = []  # Store 1 for predicted increase, 0 for decrease
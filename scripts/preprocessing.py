@@ -1,43 +1,100 @@
+import os
+import time
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
-from pymongo import MongoClient
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pymongo import MongoClient, ReplaceOne
 from datetime import datetime, timedelta
 import argparse
+import app_path  # makes the shared modules in app/ importable
+from columnar import iter_documents
+import indicators
+from indicators import warmup_rows, rsi, sma, pct_change, lag
+from storage import time_value, datetime_to_ms, ms_to_datetime, from_storage, TIME_FIELD
+from ingestion import collection_is_timeseries, MONGO_URL
+from kline_cache import refresh_cache, iter_cache, FETCH_BATCH_SIZE
+from feature_store import feature_hash, source_hash, last_feature_time, write_features, drop_features
 
+# Candles before the new ones an incremental run loads, so their features equal those of a full run:
+# 199 for SMA_200, 20 x 14 for RSI (Wilder's average forgets older candles only gradually, to ~1e-9 after that many)
+# and one more for Lag_1_RSI and Price_Change of the first new candle
+WARMUP_ROWS = warmup_rows(["rsi_14", "sma_200"]) + 1
+
+# Candles read from MongoDB, preprocessed and stored per chunk. The indicator states are carried from chunk to chunk,
+# so memory is bounded by the chunk size instead of the history. Chunks from the local cache are one month each.
+CHUNK_ROWS = 100_000
+
+
+# Collections of OPA_Data that do not hold the candles of a symbol
+SKIPPED_COLLECTIONS = ("ingest_manifest",)
 
 
 # MongoDB connect settings
 def get_mongo_connection(symbol):
-    client = MongoClient("mongodb://mongodb:27017/")
+    client = MongoClient(MONGO_URL)
     db = client['OPA_Data']
     historical_collection = db[symbol]
     preprocessed_collection = db[f'preprocessed_{symbol}_data']
     print("Connected to MongoDB successfully.")
     return historical_collection, preprocessed_collection
 
-# Function to load historical data from MongoDB
-def load_data_from_mongodb(collection, years=2):
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=years*365)
+# Function to list the symbols with candles in the database, the collections /trade-pairs lists without preprocessed and backup ones
+def candle_symbols(db):
+    return sorted(
+        name for name in db.list_collection_names()
+        if not (name in SKIPPED_COLLECTIONS or name.startswith(("preprocessed_", "system.")) or name.endswith("_backup"))
+    )
 
-    # Query MongoDB for data within the last two years
-    query = {"open_time": {"$gte": start_date, "$lte": end_date}}
+# Function to get the open_time (milliseconds) where the candles to preprocess start:
+# two years back (or the first candle, if there are none since then), i.e. where a full run starts
+def full_start_time(collection, years=2):
+    start_ms = datetime_to_ms(datetime.now() - timedelta(days=years*365))
+    timeseries = collection_is_timeseries(collection)
+    if collection.find_one({TIME_FIELD: {"$gte": time_value(start_ms, timeseries)}}, {TIME_FIELD: 1}) is None:
+        return None
+    return start_ms
 
-    # Retrieve data and convert to DataFrame
-    cursor = collection.find(query)
-    historical_data = pd.DataFrame(list(cursor))
+# Function to get the open_time (milliseconds) of the first warm-up candle of an incremental run after last_ms,
+# None if the history is shorter than the warm-up window. False if there is no candle after last_ms.
+def warmup_start_time(collection, last_ms):
+    timeseries = collection_is_timeseries(collection)
+    if collection.find_one({TIME_FIELD: {"$gt": time_value(last_ms, timeseries)}}, {TIME_FIELD: 1}) is None:
+        return False
+    warmup = list(
+        collection.find({TIME_FIELD: {"$lte": time_value(last_ms, timeseries)}}, {"_id": 0, TIME_FIELD: 1})
+        .sort(TIME_FIELD, -1).skip(WARMUP_ROWS - 1).limit(1)
+    )
+    return from_storage(warmup[0])[TIME_FIELD] if warmup else None
 
-    # If less than 2 years of data, get all available data
-    if historical_data.empty:
-        cursor = collection.find() 
-        historical_data = pd.DataFrame(list(cursor))
+# Function to stream the candles from start_ms on (all if None) out of MongoDB, in time-ordered chunks of chunk_rows
+def iter_chunks_from_mongodb(collection, start_ms=None, chunk_rows=CHUNK_ROWS):
+    # open_time is a date in time-series collections, else milliseconds
+    timeseries = collection_is_timeseries(collection)
+    query = {} if start_ms is None else {TIME_FIELD: {"$gte": time_value(start_ms, timeseries)}}
+    cursor = collection.find(query, {"_id": 0}).sort(TIME_FIELD, 1).batch_size(min(chunk_rows, FETCH_BATCH_SIZE))
 
-    return historical_data
+    documents = []
+    for document in cursor:
+        documents.append(document)
+        if len(documents) == chunk_rows:
+            yield pd.DataFrame(documents)
+            documents = []
+    if documents:
+        yield pd.DataFrame(documents)
+
+# Function to stream the candles from start_ms on (all if None) out of the local Arrow cache, one month per chunk.
+# The cache gets topped up from MongoDB first.
+def iter_chunks_from_cache(collection, start_ms=None):
+    print(f"{refresh_cache(collection)} new candles of {collection.name} cached.")
+    yield from iter_cache(collection, start_ms)
+
+# Function to preprocess one chunk of candles. states are the indicator states after the previous chunk (None for the first),
+# so the features of a chunk equal those of a single run over all candles. Returns the preprocessed chunk and the new states.
+def preprocess_chunk(historical_data, states=None):
+    states = states or {}
 
-# Function to preprocess data
-def preprocess_data(historical_data):
     # Convert 'open_time' to datetime if not already in that format
-    if historical_data['open_time'].dtype != 'datetime64[ns]':
+    if not pd.api.types.is_datetime64_any_dtype(historical_data['open_time']):
         historical_data['open_time'] = pd.to_datetime(historical_data['open_time'], unit='ms')
 
     # Sort by 'open_time'
@@ -49,51 +106,171 @@ def preprocess_data(historical_data):
     # Reset index
     historical_data.reset_index(drop=True, inplace=True)
 
-    # Calculate technical indicators: RSI, SMA_50, SMA_200
-    historical_data['RSI'] = ta.rsi(historical_data['close'], length=14)
-    historical_data['SMA_50'] = ta.sma(historical_data['close'], length=50)
-    historical_data['SMA_200'] = ta.sma(historical_data['close'], length=200)
+    # Calculate technical indicators: RSI, SMA_50, SMA_200 (NumPy kernels of app/indicators.py, same values as pandas_ta)
+    close = historical_data['close'].to_numpy(dtype=np.float64)
+    new_states = {}
+    historical_data['RSI'], new_states['RSI'] = rsi(close, length=14, state=states.get('RSI'))
+    historical_data['SMA_50'], new_states['SMA_50'] = sma(close, length=50, state=states.get('SMA_50'))
+    historical_data['SMA_200'], new_states['SMA_200'] = sma(close, length=200, state=states.get('SMA_200'))
 
     # Calculate additional features: Price_Change, Lag_1_Close, Lag_1_RSI
-    historical_data['Price_Change'] = historical_data['close'].pct_change() * 100  # Percentage change in close price
-    historical_data['Lag_1_Close'] = historical_data['close'].shift(1)  # 1-period lagged close price
-    historical_data['Lag_1_RSI'] = historical_data['RSI'].shift(1)
+    price_change, new_states['Price_Change'] = pct_change(close, state=states.get('Price_Change'))
+    historical_data['Price_Change'] = price_change * 100  # Percentage change in close price
+    historical_data['Lag_1_Close'], new_states['Lag_1_Close'] = lag(close, 1, state=states.get('Lag_1_Close'))  # 1-period lagged close price
+    historical_data['Lag_1_RSI'], new_states['Lag_1_RSI'] = lag(historical_data['RSI'], 1, state=states.get('Lag_1_RSI'))
 
     # Drop rows with missing values (due to indicator calculation)
     historical_data.dropna(subset=['SMA_50', 'SMA_200', 'RSI'], inplace=True)
 
-    return historical_data
+    return historical_data, new_states
+
+# Function to preprocess data
+def preprocess_data(historical_data):
+    return preprocess_chunk(historical_data)[0]
+
+# Definition of the features preprocess_chunk() computes. Its hash keys the materialized feature sets in the feature store.
+# It covers the source of preprocess_chunk() and of the indicator kernels, so every change of the computation puts the
+# features into a new set next to the old ones instead of extending a set computed the old way.
+FEATURES = {
+    "filter": "close > 1000",
+    "columns": {
+        "RSI": "rsi_14",
+        "SMA_50": "sma_50",
+        "SMA_200": "sma_200",
+        "Price_Change": "pct_change(close) * 100",
+        "Lag_1_Close": "lag_1(close)",
+        "Lag_1_RSI": "lag_1(RSI)",
+    },
+    "source": source_hash(preprocess_chunk, indicators),
+}
+FEATURE_HASH = feature_hash(FEATURES)
 
 # Store preprocessed data in a new MongoDB collection
 def store_preprocessed_data(preprocessed_df, collection):
-    # Convert DataFrame to dictionary and store in MongoDB
-    collection.insert_many(preprocessed_df.to_dict('records'))
-    print("Preprocessed Data Sample:")
-    print(preprocessed_df.head())
+    # Build the documents batch by batch from the typed columns and upsert them by open_time,
+    # so candles that are already stored get replaced instead of duplicated
+    preprocessed_df = preprocessed_df.drop(columns="_id", errors="ignore")
+    for batch in iter_documents(preprocessed_df):
+        collection.bulk_write([ReplaceOne({TIME_FIELD: document[TIME_FIELD]}, document, upsert=True) for document in batch], ordered=False)
 
-# Main function for preprocessing
-def main(symbol):
-    # Connect to MongoDB
-    historical_collection, preprocessed_collection = get_mongo_connection(symbol)
+# Function to preprocess the candles of one symbol, returns the number of stored preprocessed candles.
+# They go into the feature set of FEATURES in the feature store and into preprocessed_<symbol>_data.
+def preprocess_symbol(historical_collection, preprocessed_collection, use_cache=True, full=False, chunk_rows=CHUNK_ROWS):
+    symbol = historical_collection.name
+
+    # Continue after the newest candle of the current feature set, unless a full run is requested.
+    # A feature set that does not exist yet (new symbol or changed FEATURES) is computed from scratch.
+    if full:
+        drop_features(symbol, FEATURE_HASH)
+    last_ms = None if full else last_feature_time(symbol, FEATURE_HASH)
+
+    if last_ms is not None:
+        # Only the new candles and the warm-up window before them
+        start_ms = warmup_start_time(historical_collection, last_ms)
+        if start_ms is False:
+            return 0
+        print(f"{symbol}: preprocessing the candles after {ms_to_datetime(last_ms)}.")
+    else:
+        # Historical data of up to 2 years, or all available data if less
+        start_ms = full_start_time(historical_collection, years=2)
+
+    # Read the candles chunk by chunk, from the cache unless disabled
+    if use_cache:
+        chunks = iter_chunks_from_cache(historical_collection, start_ms)
+    else:
+        chunks = iter_chunks_from_mongodb(historical_collection, start_ms, chunk_rows)
+
+    # Preprocess every chunk and store it into the preprocessed collection before the next one is read
+    states, stored = None, 0
+    for historical_data in chunks:
+        preprocessed_data, states = preprocess_chunk(historical_data, states)
+        if last_ms is not None:
+            # The warm-up candles are preprocessed already
+            preprocessed_data = preprocessed_data[preprocessed_data[TIME_FIELD] > ms_to_datetime(last_ms)]
+        if preprocessed_data.empty:
+            continue
+        write_features(symbol, FEATURES, preprocessed_data)
+        store_preprocessed_data(preprocessed_data, preprocessed_collection)
+        stored += len(preprocessed_data)
+        print(f"{symbol}: stored {stored} preprocessed candles (up to {preprocessed_data[TIME_FIELD].iloc[-1]}).")
+    return stored
+
+# MongoDB database of the current worker process, set up once by the pool initializer
+_worker_db = None
+
+def _init_worker():
+    global _worker_db
+    _worker_db = MongoClient(MONGO_URL)['OPA_Data']
 
-    # Load historical data from MongoDB (up to 2 years, or all available data if less)
-    historical_data = load_data_from_mongodb(historical_collection, years=2)  # Await this async function
+# Runs inside a worker process, with the worker's own MongoDB connection
+def _preprocess_worker(symbol, use_cache, full, chunk_rows):
+    start = time.perf_counter()
+    rows = preprocess_symbol(_worker_db[symbol], _worker_db[f'preprocessed_{symbol}_data'], use_cache, full, chunk_rows)
+    return {"symbol": symbol, "rows": rows, "seconds": time.perf_counter() - start}
 
-    # Preprocess the data
-    preprocessed_data =  preprocess_data(historical_data)  # Await this async function
+# Function to preprocess many symbols in parallel
+def preprocess_parallel(symbols, workers=None, use_cache=True, full=False, chunk_rows=CHUNK_ROWS):
+    """
+    Fans the symbols out to a process pool, one symbol per task. Loading, the indicators and the writes happen in the workers.
+    Prints a summary of rows and duration per symbol. Returns (stats of preprocessed symbols, {symbol: error} of failed ones).
+    """
+    workers = min(workers or os.cpu_count() or 1, len(symbols))
+    results, failures = [], {}
+    start = time.perf_counter()
 
-    # Store the preprocessed data into a new MongoDB collection
-    store_preprocessed_data(preprocessed_data, preprocessed_collection)  # Await this async function
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(_preprocess_worker, symbol, use_cache, full, chunk_rows): symbol for symbol in symbols}
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                results.append(future.result())
+            except Exception as e:
+                failures[symbol] = str(e)
 
+    elapsed = time.perf_counter() - start
+    print(f"\n{'symbol':>20} {'rows':>10} {'duration':>10}")
+    for stats in sorted(results, key=lambda stats: stats["symbol"]):
+        print(f"{stats['symbol']:>20} {stats['rows']:>10} {stats['seconds']:>9.1f}s")
+    for symbol, error in sorted(failures.items()):
+        print(f"{symbol:>20} {'failed':>10}  {error}")
+    print(
+        f"Preprocessed {len(results)} of {len(symbols)} symbols ({sum(stats['rows'] for stats in results)} rows) "
+        f"with {workers} workers in {elapsed:.1f}s"
+    )
+    return results, failures
+
+# Main function for preprocessing
+def main(symbol, use_cache=True, full=False, chunk_rows=CHUNK_ROWS):
+    # Connect to MongoDB
+    historical_collection, preprocessed_collection = get_mongo_connection(symbol)
+
+    if preprocess_symbol(historical_collection, preprocessed_collection, use_cache, full, chunk_rows) == 0:
+        return "No new candles to preprocess."
     return "Preprocessing completed and data stored in MongoDB."
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Script for preprocessing.")
-    parser.add_argument('symbol', type=str, help="The symbol to process")
+    parser.add_argument('symbols', type=str, nargs='*', help="The symbols to process")
+    parser.add_argument('--all', action='store_true', help="Process every symbol in the database")
+    parser.add_argument('--workers', type=int, help="Worker processes for several symbols (default: number of cores)")
+    parser.add_argument('--no-cache', action='store_true', help="Read the candles from MongoDB instead of the local cache")
+    parser.add_argument('--full', action='store_true', help="Recompute the last two years instead of only the candles since the last run")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help="Candles read from MongoDB per chunk (with --no-cache)")
 
     # Parse the arguments
     args = parser.parse_args()
-    
-    # Call the main function with the parsed symbol
-    main(args.symbol)
+    symbols = args.symbols
+    if args.all:
+        with MongoClient(MONGO_URL) as client:
+            symbols = candle_symbols(client['OPA_Data'])
+    if not symbols:
+        parser.error("Pass at least one symbol or --all")
+
+    if len(symbols) == 1:
+        # Call the main function with the parsed symbol
+        print(main(symbols[0], not args.no_cache, args.full, args.chunk_rows))
+    else:
+        _, failures = preprocess_parallel(symbols, args.workers, not args.no_cache, args.full, args.chunk_rows)
+        if failures:
+            raise SystemExit(1)
 
@@ -1,8 +1,11 @@
 import os
+import sys
 import zipfile
-import pandas as pd
 import json
+import argparse
 from pymongo import MongoClient
+from ingestion import ingest_zip, read_ohlc_csv, write_frame, prepare_collection, merge_range, TIME_KEY_FIELDS, CHUNK_SIZE
+from manifest import get_manifest, pending_archives, record_archive
 
 # MongoDB connection settings
 def get_mongo_connection():
@@ -25,13 +28,13 @@ def extract_zip(zip_file, extract_dir):
 # Function to import CSV files into MongoDB
 def import_csv(file_path, collection):
     print(f"Importing CSV file: {file_path}")
-    df = pd.read_csv(file_path)
-    data = df.to_dict(orient='records')
-    if data:
-        collection.insert_many(data)
-        print(f"Inserted {len(data)} records from {file_path} into MongoDB.")
+    df = read_ohlc_csv(file_path)
+    if not df.empty:
+        write_frame(collection, df, TIME_KEY_FIELDS)
+        print(f"Upserted {len(df)} records from {file_path} into MongoDB.")
     else:
         print(f"No data found in {file_path}")
+    return df
 
 # Function to import JSON files into MongoDB
 def import_json(file_path, collection):
@@ -44,40 +47,60 @@ def import_json(file_path, collection):
         collection.insert_one(data)
     print(f"Inserted data from {file_path} into MongoDB.")
 
-# Function to process extracted files (CSV or JSON)
+# Function to process extracted files (CSV or JSON), returns the CSV row count and open_time range for the manifest
 def process_files(extract_dir, collection):
+    rows, open_time_min, open_time_max = 0, None, None
     for filename in os.listdir(extract_dir):
         file_path = os.path.join(extract_dir, filename)
         
         if filename.endswith(".csv"):
-            import_csv(file_path, collection)
+            df = import_csv(file_path, collection)
+            rows += len(df)
+            open_time_min, open_time_max = merge_range(open_time_min, open_time_max, df['open_time'])
         elif filename.endswith(".json"):
             import_json(file_path, collection)
         else:
             print(f"Skipping unsupported file: {filename}")
+    return {"rows": rows, "open_time_min": open_time_min, "open_time_max": open_time_max}
 
 # Main function
-def main():
+def main(stream=False, chunksize=CHUNK_SIZE, force=False):
     # Set the path to your folder containing ZIP files
     zip_folder = "/data/Historical_data_Binance" 
     extract_base_dir = "/data/extracted_binance_data"
 
     # Connect to MongoDB
     collection = get_mongo_connection()
+    prepare_collection(collection, TIME_KEY_FIELDS)
+    manifest = get_manifest(collection.database)
+
+    # Only ZIPs that are new or changed since the last run get processed
+    zip_paths = sorted(os.path.join(zip_folder, zip_file) for zip_file in os.listdir(zip_folder) if zip_file.endswith(".zip"))
+    for zip_path in pending_archives(manifest, collection.name, zip_paths, force):
+        # Read the CSVs straight out of the archive, nothing gets written to disk
+        if stream:
+            stats = ingest_zip(zip_path, collection, chunksize=chunksize)
+            record_archive(manifest, collection.name, stats)
+            continue
 
-    # Process each ZIP file in the specified folder
-    for zip_file in os.listdir(zip_folder):
-        if zip_file.endswith(".zip"):
-            zip_path = os.path.join(zip_folder, zip_file)
-            extract_dir = os.path.join(extract_base_dir, os.path.splitext(zip_file)[0])  # Create a unique folder for each ZIP
+        extract_dir = os.path.join(extract_base_dir, os.path.splitext(os.path.basename(zip_path))[0])  # Create a unique folder for each ZIP
 
-            # Extract ZIP file
-            extract_zip(zip_path, extract_dir)
+        # Extract ZIP file
+        extract_zip(zip_path, extract_dir)
 
-            # Process extracted files (CSV/JSON) and insert into MongoDB
-            process_files(extract_dir, collection)
+        # Process extracted files (CSV/JSON) and insert into MongoDB
+        stats = process_files(extract_dir, collection)
+        record_archive(manifest, collection.name, {"path": zip_path, **stats})
 
     print("Data import completed for all ZIP files.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Script for reading Binance ZIPs into MongoDB.")
+    parser.add_argument('--stream', action='store_true', help="Read CSVs directly from the ZIPs instead of extracting them")
+    parser.add_argument('--chunksize', type=int, help="Rows per insert in stream mode", default=CHUNK_SIZE)
+    parser.add_argument('--force', action='store_true', help="Reload all ZIPs, even if the manifest says they are loaded")
+
+    # Parse the arguments
+    args = parser.parse_args()
+
+    main(args.stream, args.chunksize, args.force)
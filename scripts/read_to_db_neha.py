@@ -1,9 +1,11 @@
 import os
+import sys
 import zipfile
-import pandas as pd
 import json
 from pymongo import MongoClient
 import argparse
+from ingestion import ingest_zip, read_ohlc_csv, write_frame, ingest_parallel, prepare_collection, merge_range, SYMBOL_KEY_FIELDS, CHUNK_SIZE
+from manifest import get_manifest, pending_archives, record_archive
 
 # MongoDB connection settings
 def get_mongo_connection(symbol):
@@ -26,18 +28,15 @@ def extract_zip(zip_file, extract_dir):
 # Function to import CSV files into MongoDB
 def import_csv(file_path, collection, symbol):
     print(f"Importing CSV file: {file_path}")
-    df = pd.read_csv(file_path)
-    data = df.to_dict(orient='records')
+    df = read_ohlc_csv(file_path)
     
-    if data:
+    if not df.empty:
         # Add the key (first 7 chars of the filename) as a key-value pair in each document
-        for record in data:
-            record['key'] = symbol
-        
-        collection.insert_many(data)
-        print(f"Inserted {len(data)} records from {file_path} into MongoDB.")
+        write_frame(collection, df, SYMBOL_KEY_FIELDS, extra={'key': symbol})
+        print(f"Upserted {len(df)} records from {file_path} into MongoDB.")
     else:
         print(f"No data found in {file_path}")
+    return df
 
 # Function to import JSON files into MongoDB
 def import_json(file_path, collection, symbol):
@@ -57,8 +56,9 @@ def import_json(file_path, collection, symbol):
     
     print(f"Inserted data from {file_path} into MongoDB.")
 
-# Function to process extracted files (CSV or JSON)
+# Function to process extracted files (CSV or JSON), returns the CSV row count and open_time range for the manifest
 def process_files(extract_dir, collection):
+    rows, open_time_min, open_time_max = 0, None, None
     for filename in os.listdir(extract_dir):
         file_path = os.path.join(extract_dir, filename)
         
@@ -66,33 +66,60 @@ def process_files(extract_dir, collection):
         symbol = filename[:7]
         
         if filename.endswith(".csv"):
-            import_csv(file_path, collection, symbol)
+            df = import_csv(file_path, collection, symbol)
+            rows += len(df)
+            open_time_min, open_time_max = merge_range(open_time_min, open_time_max, df['open_time'])
         elif filename.endswith(".json"):
             import_json(file_path, collection, symbol)
         else:
             print(f"Skipping unsupported file: {filename}")
+    return {"rows": rows, "open_time_min": open_time_min, "open_time_max": open_time_max}
 
 # Main function
-def main(symbol, folder):
+def main(symbol, folder, stream=False, chunksize=CHUNK_SIZE, workers=1, retries=2, force=False):
     # Set the path to your folder containing ZIP files
     zip_folder = f"/data/{folder}" 
-    extract_base_dir = f"/data/{folder}_extracted"
-    os.makedirs(extract_base_dir, exist_ok=True)
 
     # Connect to MongoDB
     collection = get_mongo_connection(symbol)
+    prepare_collection(collection, SYMBOL_KEY_FIELDS)
+    manifest = get_manifest(collection.database)
+
+    # Only ZIPs that are new or changed since the last run get processed
+    zip_paths = sorted(os.path.join(zip_folder, zip_file) for zip_file in os.listdir(zip_folder) if zip_file.endswith(".zip"))
+    zip_paths = pending_archives(manifest, symbol, zip_paths, force)
+
+    # Parallel mode: every ZIP is streamed by a worker process with its own MongoDB connection
+    if workers > 1:
+        _, failures = ingest_parallel(
+            zip_paths, symbol, workers=workers, tag_key=True, chunksize=chunksize, retries=retries,
+            on_loaded=lambda stats: record_archive(manifest, symbol, stats, stats.pop("fingerprint")),
+        )
+        if failures:
+            sys.exit(1)
+        print("Data import completed for all ZIP files.")
+        return
+
+    extract_base_dir = f"/data/{folder}_extracted"
+    if not stream:
+        os.makedirs(extract_base_dir, exist_ok=True)
+
+    # Process each new or changed ZIP file in the specified folder
+    for zip_path in zip_paths:
+        # Read the CSVs straight out of the archive, nothing gets written to disk
+        if stream:
+            stats = ingest_zip(zip_path, collection, tag_key=True, chunksize=chunksize)
+            record_archive(manifest, symbol, stats)
+            continue
 
-    # Process each ZIP file in the specified folder
-    for zip_file in os.listdir(zip_folder):
-        if zip_file.endswith(".zip"):
-            zip_path = os.path.join(zip_folder, zip_file)
-            extract_dir = os.path.join(extract_base_dir, os.path.splitext(zip_file)[0])  # Create a unique folder for each ZIP
-            os.makedirs(extract_dir, exist_ok=True)
-            # Extract ZIP file
-            extract_zip(zip_path, extract_dir)
+        extract_dir = os.path.join(extract_base_dir, os.path.splitext(os.path.basename(zip_path))[0])  # Create a unique folder for each ZIP
+        os.makedirs(extract_dir, exist_ok=True)
+        # Extract ZIP file
+        extract_zip(zip_path, extract_dir)
 
-            # Process extracted files (CSV/JSON) and insert into MongoDB
-            process_files(extract_dir, collection)
+        # Process extracted files (CSV/JSON) and insert into MongoDB
+        stats = process_files(extract_dir, collection)
+        record_archive(manifest, symbol, {"path": zip_path, **stats})
 
     print("Data import completed for all ZIP files.")
 
@@ -100,9 +127,14 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Script for preprocessing.")
     parser.add_argument('symbol', type=str, help="The symbol to process")
     parser.add_argument('folder', type=str, help="Folder where Zips are stored")
+    parser.add_argument('--stream', action='store_true', help="Read CSVs directly from the ZIPs instead of extracting them")
+    parser.add_argument('--chunksize', type=int, help="Rows per insert in stream mode", default=CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, help="Number of worker processes, more than 1 enables parallel streaming", default=1)
+    parser.add_argument('--retries', type=int, help="Retries per failed ZIP in parallel mode", default=2)
+    parser.add_argument('--force', action='store_true', help="Reload all ZIPs, even if the manifest says they are loaded")
 
     # Parse the arguments
     args = parser.parse_args()
     
     # Call the main function with the parsed symbol
-    main(args.symbol, args.folder)
+    main(args.symbol, args.folder, args.stream, args.chunksize, args.workers, args.retries, args.force)
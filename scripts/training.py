@@ -1,21 +1,46 @@
+import re
 import sys
+import json
 import joblib
-import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, classification_report, f1_score, precision_score, recall_score, confusion_matrix
 from pymongo import MongoClient
+from kline_cache import cached_frame
+from feature_store import load_features, read_manifest
+from preprocessing import FEATURE_HASH
 
 # MongoDB Connection Setup
 client = MongoClient('mongodb://mongodb:27017/')
 db = client['OPA_Data']  # Match the database used in preprocessing.py
 
+# Columns the model is trained on and the one the target is derived from
+FEATURE_COLUMNS = ['Lag_1_RSI', 'SMA_50', 'SMA_200', 'Lag_1_Close']
+TARGET_COLUMN = 'Price_Change'
+
+# Feature set of the saved model, read by prediction.py
+MODEL_FEATURES_PATH = 'random_forest_model.features.json'
+
+
+# Function to load the training data: the current feature set of the symbol from the feature store,
+# only the needed columns. Falls back to the preprocessed collection if there is no such feature set yet.
+def load_training_data(collection_name):
+    symbol = re.sub(r"^preprocessed_(.+)_data$", r"\1", collection_name)
+    manifest = read_manifest(symbol, FEATURE_HASH)
+    if manifest is not None:
+        collection_data = load_features(symbol, FEATURE_HASH, columns=FEATURE_COLUMNS + [TARGET_COLUMN])
+        print(f"Loaded {len(collection_data)} rows of feature set {FEATURE_HASH} of {symbol} from the feature store.")
+        return collection_data, manifest
 
-def train_model(collection_name):
     # Load preprocessed data from MongoDB
+    # (read through the local Arrow cache, only rows added since the last run are fetched from MongoDB)
+    print(f"No feature set {FEATURE_HASH} of {symbol} in the feature store, run preprocessing.py {symbol} to create it.")
     collection = db[collection_name]
-    stored_data = list(collection.find({}, {'RSI': 1, 'SMA_50': 1, 'SMA_200': 1, 'Price_Change': 1, 'Lag_1_Close': 1, 'Lag_1_RSI': 1}))
-    collection_data = pd.DataFrame(stored_data)
+    return cached_frame(collection, columns=FEATURE_COLUMNS + [TARGET_COLUMN]), None
+
+
+def train_model(collection_name):
+    collection_data, manifest = load_training_data(collection_name)
 
     # Check if data is loaded successfully
     if collection_data.empty:
@@ -23,8 +48,8 @@ def train_model(collection_name):
         return
 
     # Define features (X) and target (y)
-    X = collection_data[['Lag_1_RSI', 'SMA_50', 'SMA_200', 'Lag_1_Close']]
-    y = (collection_data['Price_Change'] > 0).astype(int)  # Binary target: 1 if price increased, 0 if not
+    X = collection_data[FEATURE_COLUMNS]
+    y = (collection_data[TARGET_COLUMN] > 0).astype(int)  # Binary target: 1 if price increased, 0 if not
 
     # Print the features and target tables
     print("Features (X):")
@@ -66,6 +91,17 @@ def train_model(collection_name):
     joblib.dump(model, 'random_forest_model.pkl')
     print("Model saved as 'random_forest_model.pkl' inside your project folder.")
 
+    # Save which features the model was trained on
+    with open(MODEL_FEATURES_PATH, 'w') as f:
+        json.dump({
+            "collection": collection_name,
+            "definition_hash": manifest["definition_hash"] if manifest else None,
+            "columns": FEATURE_COLUMNS,
+            "start_ms": manifest["start_ms"] if manifest else None,
+            "end_ms": manifest["end_ms"] if manifest else None,
+            "rows": len(collection_data),
+        }, f, indent=2)
+
 if __name__ == "__main__":
     if len(sys.argv) != 2:
         print("Usage: python3 training.py <collection_name>")
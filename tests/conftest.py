@@ -0,0 +1,8 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# The API and the scripts import their shared modules by flat names, like in their containers
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "app"), os.path.join(ROOT, "scripts")]
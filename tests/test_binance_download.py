@@ -0,0 +1,91 @@
+# tests/test_binance_download.py
+
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from binance_download import download_archive, ChecksumMismatch
+
+NAME = "BTCUSDT-1m-2024-01-01.zip"
+ARCHIVE = os.urandom(300_000)
+
+
+class ArchiveHandler(BaseHTTPRequestHandler):
+    """
+    Serves ARCHIVE and its .CHECKSUM with Range support. The archive responses pop a fault from server.faults first:
+    "truncate" closes the connection after half of the body, "corrupt" sends different bytes.
+    """
+
+    def do_GET(self):
+        if self.path.endswith(".CHECKSUM"):
+            return self._send(200, f"{hashlib.sha256(ARCHIVE).hexdigest()}  {NAME}\n".encode())
+        self.server.ranges.append(self.headers.get("Range"))
+        fault = self.server.faults.pop(0) if self.server.faults else None
+        offset = int(self.headers["Range"][len("bytes="):-1]) if self.headers.get("Range") else 0
+        body = ARCHIVE[offset:] if fault != "corrupt" else os.urandom(len(ARCHIVE))
+        self.send_response(206 if offset else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if fault == "truncate":
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ArchiveHandler)
+    server.faults, server.ranges = [], []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_port}/{NAME}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def download(server, local_file, retries=3):
+    with requests.Session() as session:
+        return download_archive(session, server.url, str(local_file), retries=retries, backoff=0)
+
+
+def test_connection_lost_mid_body_is_resumed(server, tmp_path):
+    server.faults = ["truncate"]
+    assert download(server, tmp_path / NAME) == "downloaded"
+    assert (tmp_path / NAME).read_bytes() == ARCHIVE
+    # The second request continues after the blocks that were written before the connection broke
+    assert server.ranges[0] is None
+    assert 0 < int(server.ranges[1][len("bytes="):-1]) <= len(ARCHIVE) // 2
+
+
+def test_checksum_mismatch_is_downloaded_again(server, tmp_path):
+    server.faults = ["corrupt"]
+    assert download(server, tmp_path / NAME) == "downloaded"
+    assert (tmp_path / NAME).read_bytes() == ARCHIVE
+    assert server.ranges == [None, None]
+
+
+def test_checksum_mismatch_fails_after_the_retries(server, tmp_path):
+    server.faults = ["corrupt"] * 3
+    with pytest.raises(ChecksumMismatch):
+        download(server, tmp_path / NAME, retries=2)
+    assert not os.path.exists(tmp_path / NAME) and not os.path.exists(tmp_path / f"{NAME}.part")
+
+
+def test_part_file_of_an_earlier_run_is_resumed(server, tmp_path):
+    (tmp_path / f"{NAME}.part").write_bytes(ARCHIVE[:100_000])
+    assert download(server, tmp_path / NAME) == "downloaded"
+    assert (tmp_path / NAME).read_bytes() == ARCHIVE
+    assert server.ranges == ["bytes=100000-"]
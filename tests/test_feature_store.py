@@ -0,0 +1,38 @@
+# tests/test_feature_store.py
+
+import numpy as np
+import pandas as pd
+import pytest
+from feature_store import write_features, read_manifest, load_features, feature_hash, source_hash
+
+pytest.importorskip("pyarrow")
+
+DEFINITION = {"version": 1, "features": ["close"]}
+MONTH_START = 1698796800000  # 2023-11-01
+
+
+def features(first, rows):
+    open_time = MONTH_START + (first + np.arange(rows)) * 3_600_000
+    return pd.DataFrame({"open_time": open_time, "close": np.arange(rows, dtype=np.float64)})
+
+
+def test_manifest_counts_rows_per_month(tmp_path):
+    # Three chunks over November and December 2023, the second one overlaps the first
+    for first, rows in [(0, 600), (500, 400), (900, 800)]:
+        write_features("BTCUSDT", DEFINITION, features(first, rows), root=str(tmp_path))
+
+    manifest = read_manifest("BTCUSDT", feature_hash(DEFINITION), root=str(tmp_path))
+    assert manifest["months"] == {"2023-11": 720, "2023-12": 744, "2024-01": 236}
+    assert manifest["rows"] == 1700 == len(load_features("BTCUSDT", feature_hash(DEFINITION), root=str(tmp_path)))
+
+
+def test_source_hash_follows_the_code():
+    def double(x):
+        return x * 2
+
+    def triple(x):
+        return x * 3
+
+    assert source_hash(double) == source_hash(double)
+    assert source_hash(double) != source_hash(triple)
+    assert source_hash(double, triple) != source_hash(double)
@@ -0,0 +1,27 @@
+# tests/test_formats.py
+
+import json
+import math
+from datetime import datetime
+import pytest
+from formats import JsonEncoder
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_json_layouts_encode_the_same_documents(stream):
+    documents = [
+        {"open_time": datetime(2024, 1, 1), "close": 42000.5, "RSI": 55.0},
+        {"open_time": datetime(2024, 1, 1, 0, 1), "close": 42001.0, "RSI": 56.0},
+    ]
+    body = JsonEncoder(stream).encode(documents).decode()
+    decoded = [json.loads(line) for line in body.splitlines()] if stream else json.loads(body)
+    assert decoded == [
+        {"open_time": "2024-01-01T00:00:00", "close": 42000.5, "RSI": 55.0},
+        {"open_time": "2024-01-01T00:01:00", "close": 42001.0, "RSI": 56.0},
+    ]
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_json_layouts_reject_nan(stream):
+    with pytest.raises(ValueError):
+        JsonEncoder(stream).encode([{"open_time": 1, "RSI": math.nan}])
@@ -0,0 +1,59 @@
+# tests/test_indicator_cache.py
+
+import asyncio
+import numpy as np
+import pytest
+from indicator_cache import _compute_segment, _extend_segment
+
+NAMES = ("rsi_14", "sma_50", "sma_200", "ema_20", "price_change")
+OPERATORS = {"$gt": np.greater, "$gte": np.greater_equal, "$lt": np.less, "$lte": np.less_equal}
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, field, direction):
+        self.documents = sorted(self.documents, key=lambda document: document[field], reverse=direction < 0)
+        return self
+
+    def limit(self, limit):
+        self.documents = self.documents[:limit]
+        return self
+
+    async def to_list(self, length):
+        return [dict(document) for document in self.documents[:length]]
+
+
+class FakeCollection:
+    """
+    The part of a Motor collection the indicator cache uses, with open_time range queries
+    """
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, query, projection=None):
+        conditions = query.get("open_time", {})
+        return FakeCursor([
+            document for document in self.documents
+            if all(OPERATORS[operator](document["open_time"], value) for operator, value in conditions.items())
+        ])
+
+
+def candles(rows):
+    close = 30000 + np.cumsum(np.random.default_rng(11).normal(0, 20, rows))
+    return [{"open_time": 1700000000000 + i * 60_000, "close": float(value)} for i, value in enumerate(close)]
+
+
+@pytest.mark.parametrize("stored, total", [(150, 400), (20, 60), (199, 200), (300, 1000)])
+def test_extended_segment_equals_recomputed(stored, total):
+    documents = candles(total)
+    segment = asyncio.run(_compute_segment(FakeCollection(documents[:stored]), False, NAMES, None, None, total))
+    extended = asyncio.run(_extend_segment(FakeCollection(documents), False, segment, NAMES, None, total))
+    recomputed = asyncio.run(_compute_segment(FakeCollection(documents), False, NAMES, None, None, total))
+
+    np.testing.assert_array_equal(extended.open_time, recomputed.open_time)
+    for name in NAMES:
+        np.testing.assert_array_equal(np.isnan(extended.columns[name]), np.isnan(recomputed.columns[name]))
+        np.testing.assert_allclose(extended.columns[name], recomputed.columns[name], rtol=1e-9, equal_nan=True)
@@ -0,0 +1,74 @@
+# tests/test_indicators.py
+
+import numpy as np
+import pytest
+from indicators import rsi, sma, ema, macd, bbands, rolling_std, atr, pct_change, lag, parse_indicator, MAX_INDICATOR_LENGTH
+
+ROWS = 2000
+# Chunk sizes below, around and above the longest window (200)
+CHUNK_SIZES = [1, 7, 150, 199, 200, 500]
+
+
+def candles(rows=ROWS):
+    rng = np.random.default_rng(7)
+    close = 30000 + np.cumsum(rng.normal(0, 20, rows))
+    return close + rng.random(rows) * 30, close - rng.random(rows) * 30, close
+
+
+def as_tuple(values):
+    return values if isinstance(values, tuple) else (values,)
+
+
+def chunked(kernel, arrays, chunk_size):
+    """
+    Runs kernel(*arrays, state=...) chunk by chunk, carrying the state, and concatenates the outputs
+    """
+    outputs, state = [], None
+    for start in range(0, len(arrays[0]), chunk_size):
+        values, state = kernel(*[array[start:start + chunk_size] for array in arrays], state=state)
+        outputs.append(as_tuple(values))
+    return tuple(np.concatenate(parts) for parts in zip(*outputs))
+
+
+KERNELS = {
+    "rsi_14": (lambda close, state: rsi(close, 14, state), "close"),
+    "sma_200": (lambda close, state: sma(close, 200, state), "close"),
+    "ema_50": (lambda close, state: ema(close, 50, state), "close"),
+    "std_20": (lambda close, state: rolling_std(close, 20, 0, state), "close"),
+    "bbands_200": (lambda close, state: bbands(close, 200, state=state), "close"),
+    "macd": (lambda close, state: macd(close, state=state), "close"),
+    "atr_14": (lambda high, low, close, state: atr(high, low, close, 14, state), "hlc"),
+    "lag_3": (lambda close, state: lag(close, 3, state), "close"),
+    "pct_change": (lambda close, state: pct_change(close, state), "close"),
+}
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("name", KERNELS)
+def test_chunked_equals_single_pass(name, chunk_size):
+    kernel, inputs = KERNELS[name]
+    high, low, close = candles()
+    arrays = (high, low, close) if inputs == "hlc" else (close,)
+
+    expected = as_tuple(kernel(*arrays, state=None)[0])
+    for got, want in zip(chunked(kernel, arrays, chunk_size), expected):
+        np.testing.assert_array_equal(np.isnan(got), np.isnan(want))
+        np.testing.assert_allclose(got, want, rtol=1e-9, equal_nan=True)
+
+
+def test_sma_state_keeps_short_history():
+    close = candles(300)[2]
+    values, state = sma(close[:150], 200)
+    assert len(state) == 150
+    values, state = sma(close[150:], 200, state)
+    assert np.isnan(values[:49]).all() and not np.isnan(values[49:]).any()
+
+
+@pytest.mark.parametrize("name", ["rsi_0", f"sma_{MAX_INDICATOR_LENGTH + 1}", "rsi_5000000", "ema_14x"])
+def test_parse_indicator_rejects_invalid_lengths(name):
+    with pytest.raises(ValueError):
+        parse_indicator(name)
+
+
+def test_parse_indicator_accepts_the_maximum_length():
+    assert parse_indicator(f"EMA_{MAX_INDICATOR_LENGTH}") == ("ema", MAX_INDICATOR_LENGTH)
@@ -0,0 +1,44 @@
+# tests/test_ingestion.py
+
+import zipfile
+import pytest
+import ingestion
+from columnar import OHLC_COLUMNS
+
+mongomock = pytest.importorskip("mongomock")
+
+
+def write_archive(path, rows):
+    lines = []
+    for i in range(rows):
+        open_time = 1700000000000 + i * 60_000
+        values = {name: 1.0 for name in OHLC_COLUMNS}
+        values.update(open_time=open_time, close_time=open_time + 59_999, number_of_trades=1)
+        lines.append(",".join(str(values[name]) for name in OHLC_COLUMNS) + ",0")
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("BTCUSDT-1m-2023-11.csv", "\n".join(lines) + "\n")
+
+
+@pytest.mark.parametrize("tag_key", [False, True])
+def test_retry_does_not_duplicate_timeseries_rows(tmp_path, monkeypatch, tag_key):
+    zip_path = str(tmp_path / "BTCUSDT-1m-2023-11.zip")
+    write_archive(zip_path, 250)
+    collection = mongomock.MongoClient()["OPA_Data"]["ohlc_data"]
+    monkeypatch.setitem(ingestion._layouts, collection.name, True)
+    monkeypatch.setattr(ingestion, "_worker_collection", collection)
+    monkeypatch.setattr(ingestion.time, "sleep", lambda seconds: None)
+
+    # The first attempt fails after two of the three chunks are written
+    insert_many, calls = collection.insert_many, []
+    def flaky_insert_many(batch, **kwargs):
+        calls.append(len(batch))
+        if len(calls) == 3:
+            raise ConnectionError("connection reset")
+        return insert_many(batch, **kwargs)
+    monkeypatch.setattr(collection, "insert_many", flaky_insert_many)
+
+    stats = ingestion._ingest_worker(zip_path, tag_key, 100, retries=1)
+
+    assert stats["rows"] == 250
+    assert collection.count_documents({}) == 250
+    assert len(collection.distinct("open_time")) == 250
@@ -0,0 +1,20 @@
+# tests/test_jobs.py
+
+import asyncio
+from jobs import submit_job
+
+
+def test_future_of_a_job_that_already_finished():
+    def run(write):
+        write(b"done\n")
+        return 0
+
+    job, finished = submit_job("fast.py", [], run)
+    finished.result(timeout=10)  # the job is done before anybody awaits it
+
+    async def wait():
+        return await asyncio.wrap_future(finished)
+
+    record = asyncio.run(wait())
+    assert record is job
+    assert (record["status"], record["exit_code"], record["output"]) == ("done", 0, "done\n")
@@ -0,0 +1,31 @@
+# tests/test_preprocessing.py
+
+import numpy as np
+import pandas as pd
+import pytest
+from preprocessing import preprocess_chunk, preprocess_data
+
+FEATURE_COLUMNS = ["RSI", "SMA_50", "SMA_200", "Price_Change", "Lag_1_Close", "Lag_1_RSI"]
+
+
+def candles(rows=2000):
+    close = 30000 + np.cumsum(np.random.default_rng(3).normal(0, 20, rows))
+    return pd.DataFrame({"open_time": 1700000000000 + np.arange(rows, dtype=np.int64) * 60_000, "close": close})
+
+
+@pytest.mark.parametrize("chunk_sizes", [[150, 1850], [1, 199, 1800], [30] * 67, [100_000]])
+def test_chunked_preprocessing_equals_single_pass(chunk_sizes):
+    df = candles()
+    expected = preprocess_data(df.copy())
+
+    parts, states, start = [], None, 0
+    for size in chunk_sizes:
+        chunk, states = preprocess_chunk(df.iloc[start:start + size].copy(), states)
+        parts.append(chunk)
+        start += size
+    got = pd.concat(parts, ignore_index=True)
+
+    assert len(got) == len(expected) == 1801
+    assert (got["open_time"].values == expected["open_time"].values).all()
+    for column in FEATURE_COLUMNS:
+        np.testing.assert_allclose(got[column].values, expected[column].values, rtol=1e-9, equal_nan=True)
@@ -0,0 +1,50 @@
+# tests/test_uploads.py
+
+import asyncio
+import io
+import zipfile
+import pytest
+from columnar import OHLC_COLUMNS
+from uploads import start_upload, ingest_upload
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+def csv_bytes(first, rows):
+    lines = []
+    for i in range(first, first + rows):
+        open_time = 1700000000000 + i * 60_000
+        values = {name: 1.0 for name in OHLC_COLUMNS}
+        values.update(open_time=open_time, close_time=open_time + 59_999, number_of_trades=1)
+        lines.append(",".join(str(values[name]) for name in OHLC_COLUMNS) + ",0")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def zip_bytes(first, rows):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("BTCUSDT-1m-2023-11.csv", csv_bytes(first, rows))
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("make_file, is_zip", [(csv_bytes, False), (zip_bytes, True)])
+def test_uploading_overlapping_files_skips_stored_candles(make_file, is_zip):
+    collection = mongomock_motor.AsyncMongoMockClient()["OPA_Data"]["BTCUSDT"]
+
+    async def upload(first, rows):
+        progress = start_upload("BTCUSDT", "upload", None)
+        added = await ingest_upload(collection, io.BytesIO(make_file(first, rows)), is_zip, progress)
+        return added, progress
+
+    async def run():
+        await collection.create_index("open_time", unique=True)
+        first = await upload(0, 300)
+        again = await upload(0, 300)
+        overlapping = await upload(200, 300)
+        return first, again, overlapping, await collection.count_documents({})
+
+    (added, _), (again, progress), (overlapping, overlap_progress), stored = asyncio.run(run())
+    assert added == 300
+    assert (again, progress["duplicates"], progress["status"]) == (0, 300, "done")
+    assert (overlapping, overlap_progress["duplicates"]) == (200, 100)
+    assert stored == 500
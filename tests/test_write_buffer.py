@@ -0,0 +1,89 @@
+# tests/test_write_buffer.py
+
+import asyncio
+import pytest
+from bson import ObjectId
+from pymongo.errors import AutoReconnect, BulkWriteError
+import write_buffer
+from write_buffer import WriteBuffer
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+SYMBOL = "BTCUSDT"
+
+
+def candle(open_time):
+    return {"_id": ObjectId(), "open_time": open_time, "close": 1.0}
+
+
+@pytest.fixture
+def database(monkeypatch):
+    async def no_indexes(database, name):
+        pass
+    monkeypatch.setattr(write_buffer, "ensure_written_collection_indexes", no_indexes)
+    database = mongomock_motor.AsyncMongoMockClient()["OPA_Data"]
+    # mongomock has no write concerns, and with_options would return a synchronous collection
+    monkeypatch.setattr(type(database[SYMBOL]), "with_options", lambda collection, **options: collection, raising=False)
+    asyncio.run(database[SYMBOL].create_index("open_time", unique=True))
+    return database
+
+
+def test_acknowledged_callers_get_their_own_write_errors(database):
+    async def run():
+        buffer = WriteBuffer(database, flush_size=1000)
+        await database[SYMBOL].insert_one(candle(2))
+        duplicate = asyncio.create_task(buffer.add(SYMBOL, [candle(1), candle(2)], wait=True))
+        fresh = asyncio.create_task(buffer.add(SYMBOL, [candle(3)], wait=True))
+        await asyncio.sleep(0)
+        await buffer.flush(SYMBOL)
+        return await asyncio.gather(duplicate, fresh, return_exceptions=True)
+
+    duplicate, fresh = asyncio.run(run())
+    assert isinstance(duplicate, BulkWriteError)
+    assert [item["index"] for item in duplicate.details["writeErrors"]] == [1]
+    assert fresh is None
+    assert sorted(asyncio.run(database[SYMBOL].distinct("open_time"))) == [1, 2, 3]
+
+
+def test_failed_flush_requeues_unacknowledged_documents(database, monkeypatch):
+    async def run():
+        collection = database[SYMBOL]
+        buffer = WriteBuffer({SYMBOL: collection}, flush_size=1000)
+        await buffer.add(SYMBOL, [candle(1), candle(2)])
+        acknowledged = asyncio.create_task(buffer.add(SYMBOL, [candle(3)], wait=True))
+        await asyncio.sleep(0)
+
+        insert_many = collection.insert_many
+        async def unreachable(documents, **kwargs):
+            raise AutoReconnect("connection refused")
+        monkeypatch.setattr(collection, "insert_many", unreachable)
+        await buffer.flush(SYMBOL)
+        monkeypatch.setattr(collection, "insert_many", insert_many)
+        with pytest.raises(AutoReconnect):
+            await acknowledged
+
+        await buffer.flush(SYMBOL)
+        return await collection.distinct("open_time")
+
+    assert sorted(asyncio.run(run())) == [1, 2]
+
+
+def test_documents_are_dropped_after_max_attempts(database, caplog):
+    async def run():
+        collection = database[SYMBOL]
+        async def unreachable(documents, **kwargs):
+            raise AutoReconnect("connection refused")
+        collection.insert_many = unreachable
+        buffer = WriteBuffer({SYMBOL: collection}, flush_size=1000, max_attempts=3)
+        await buffer.add(SYMBOL, [candle(1), candle(2)])
+        pending = []
+        for _ in range(3):
+            await buffer.flush(SYMBOL)
+            pending.append(len(buffer._documents.get(SYMBOL, [])))
+        await buffer.add(SYMBOL, [candle(3)])
+        await buffer.stop()
+        return pending
+
+    assert asyncio.run(run()) == [2, 2, 0]
+    assert "Dropped 2 documents of BTCUSDT after 3 failed write-behind flushes." in caplog.text
+    assert "stopped with 1 unwritten documents" in caplog.text